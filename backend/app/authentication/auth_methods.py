@@ -1,13 +1,17 @@
-from fastapi import HTTPException, Depends, status
+from fastapi import HTTPException, Depends, Header, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Annotated
 
 from ..logger_manager import LoggerManager
+from ..metrics import password_hash_queue_depth
 from .models import User, TokenData, UserInDB
+from .user_cache import UserCache
 from ..database_manager import get_db
 from ..collections.helper_methods import delete_collection
 
@@ -15,6 +19,7 @@ SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f
 ADMIN_KEY = os.getenv("ADMIN_KEY", "1234")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 10
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
 
 
 # OAuth2 Setup
@@ -26,9 +31,25 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 logger_instance = LoggerManager()
 logger = logger_instance.get_logger()
 
+user_cache = UserCache()
+
+# bcrypt ist CPU-lastig und gibt den GIL frei -> eigener Thread Pool statt Event Loop
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password_hash")
+
+async def run_in_password_executor(function, *args):
+    password_hash_queue_depth.inc()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, function, *args)
+    finally:
+        password_hash_queue_depth.dec()
+
 # Passwort-Hash überprüfen
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await run_in_password_executor(pwd_context.verify, plain_password, hashed_password)
+
+# Passwort hashen
+async def hash_password(password):
+    return await run_in_password_executor(pwd_context.hash, password)
 
 # **Benutzer aus `users`-Collection abrufen**
 async def get_user(username: str):
@@ -47,7 +68,7 @@ async def create_user(username: str, fullname: str, email: str, password: str, a
         username=username,
         full_name=fullname,
         email=email,
-        hashed_password=pwd_context.hash(password),
+        hashed_password=await hash_password(password),
         disabled=False
     )
 
@@ -58,6 +79,7 @@ async def create_user(username: str, fullname: str, email: str, password: str, a
 async def delete_user_in_db(username: str):
     db = get_db()
     result = await db["users"].delete_one({"username": username})
+    await user_cache.invalidate_user(username)
 
     collections_to_delete = db.users_collections.find({"owner": username})
 
@@ -82,7 +104,7 @@ async def authenticate_user(username: str, password: str):
     user = await get_user(username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
     return user
 
@@ -98,34 +120,47 @@ def create_access_token(data: dict, expires_delta: Optional[int] = None):
     return encoded_jwt
 
 # Benutzerinformationen aus Token extrahieren
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> UserInDB:
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> User:
     return await extract_token(token)
 
-async def extract_token(token: str) -> UserInDB:
+async def extract_token(token: str) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    # bereits verifizierte Tokens überspringen jwt.decode
+    username = user_cache.get_username_of_token(token)
+
+    if username is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
+            logger.warning(f"Could not validate credentials")
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        logger.warning(f"Could not validate credentials")
-        raise credentials_exception
 
-    user = await get_user(username=token_data.username)
+        user_cache.set_username_of_token(token, username, payload.get("exp"))
+
+    token_data = TokenData(username=username)
+
+    user = await user_cache.get_user(token_data.username, get_user)
     if user is None:
         logger.warning(f"Could not validate credentials")
         raise credentials_exception
     return user
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> UserInDB:
+async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     if current_user.disabled:
         logger.warning(f"user {current_user.username} disabled. Tried to login")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+# Admin-Endpunkte über den gleichen Admin-Key wie beim Sign-up absichern
+async def verify_admin_key(admin_key: Annotated[str, Header()]):
+    if admin_key != ADMIN_KEY:
+        logger.warning(f"admin key wrong")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="admin key wrong")
@@ -0,0 +1,167 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+from redis.asyncio import Redis
+
+from ..logger_manager import LoggerManager
+from ..database_manager import get_redis
+from ..task_manager import TaskManager
+from .models import User, UserInDB
+
+T = TypeVar("T")
+
+INVALIDATION_CHANNEL = "user_cache_invalidation"
+
+
+class TTLCache(Generic[T]):
+    """Kleiner LRU Cache mit Ablaufzeit pro Eintrag."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[T]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: T, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class UserCache:
+    """
+    Cache für authentifizierte Benutzer (pro Worker, optional zusätzlich in Redis)
+    und für bereits verifizierte JWTs (Hash des Tokens -> username).
+    Gecacht wird `User` ohne Passwort-Hash, invalidiert wird in allen Workern über Redis pub/sub.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(UserCache, cls).__new__(cls, *args, **kwargs)
+            cls._instance._setup()
+        return cls._instance
+
+    def _setup(self):
+        logger_instance = LoggerManager()
+        self.logger = logger_instance.get_logger("User Cache")
+
+        ttl = float(os.getenv("USER_CACHE_TTL", "10"))
+        max_entries = int(os.getenv("USER_CACHE_SIZE", "10000"))
+        self.use_redis = os.getenv("USER_CACHE_REDIS", "0") == "1"
+
+        self.users: TTLCache[User] = TTLCache(max_entries, ttl)
+        self.tokens: TTLCache[str] = TTLCache(max_entries, ttl)
+        self.listener_task: Optional[asyncio.Task] = None
+        self.taskManager = TaskManager()
+
+    async def init(self, redis: Redis):
+        self.redis = redis
+        self.listener_task = self.taskManager.create_task(self.listen_for_invalidations())
+
+    async def shutdown(self):
+        if self.listener_task:
+            self.listener_task.cancel()
+            self.listener_task = None
+
+    # ------------------- users -------------------
+
+    async def get_user(self, username: str, loader: Callable[[str], Awaitable[Optional[UserInDB]]]) -> Optional[User]:
+        user = self.users.get(username)
+        if user is not None:
+            return user
+
+        if self.use_redis:
+            cached_user = await get_redis().get(self.get_redis_key(username))
+            if cached_user:
+                user = User.model_validate_json(cached_user)
+                self.users.set(username, user)
+                return user
+
+        user_in_db = await loader(username)
+        if user_in_db is None:
+            return None
+
+        user = User.model_validate(user_in_db.model_dump(exclude={"hashed_password"}))
+        self.users.set(username, user)
+        if self.use_redis:
+            await get_redis().set(self.get_redis_key(username), user.model_dump_json(), ex=int(self.users.ttl) or 1)
+
+        return user
+
+    async def invalidate_user(self, username: str):
+        self.logger.debug(f"invalidate cached user {username}")
+        self.users.delete(username)
+
+        async with get_redis().pipeline(transaction=False) as pipe:
+            if self.use_redis:
+                pipe.delete(self.get_redis_key(username))
+            pipe.publish(INVALIDATION_CHANNEL, username)
+            await pipe.execute()
+
+    def get_redis_key(self, username: str) -> str:
+        return f"user_cache:{username}"
+
+    # ------------------- tokens -------------------
+
+    def get_username_of_token(self, token: str) -> Optional[str]:
+        return self.tokens.get(self.hash_token(token))
+
+    def set_username_of_token(self, token: str, username: str, expires_at: Optional[float]):
+        # Token darf nie länger gecacht werden, als er gültig ist
+        ttl = None if expires_at is None else expires_at - time.time()
+        self.tokens.set(self.hash_token(token), username, ttl)
+
+    def hash_token(self, token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    # ------------------- pub/sub -------------------
+
+    async def listen_for_invalidations(self):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                self.logger.debug(f"subscribed to {INVALIDATION_CHANNEL}")
+
+                async for message in pubsub.listen():
+                    self.users.delete(message["data"])
+
+            except asyncio.CancelledError:
+                self.logger.info("User cache invalidation listener cancelled.")
+                break
+            except Exception as e:
+                # Nachrichten können während eines Reconnects verloren gehen
+                self.logger.error(f"Error in user cache invalidation listener: {e}")
+                self.users.clear()
+                await asyncio.sleep(0.3)
+            finally:
+                await pubsub.aclose()
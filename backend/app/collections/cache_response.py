@@ -0,0 +1,29 @@
+from typing import Any
+import orjson
+from fastapi import Response
+
+
+class CachedJSONResponse(Response):
+    """
+    Antwort für bereits serialisierte JSON-Daten (z. B. aus Redis).
+    Bytes werden unverändert gesendet, ohne erneutes Parsen oder `jsonable_encoder`.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if isinstance(content, str):
+            return content.encode("utf-8")
+        return orjson.dumps(content)
+
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content)
+
+
+def splice_source(payload: bytes, source: str) -> bytes:
+    """Fügt `"source": <source>` vorne in ein serialisiertes JSON-Objekt ein, ohne es zu parsen."""
+    if payload == b"{}":
+        return b'{"source":' + orjson.dumps(source) + b"}"
+    return b'{"source":' + orjson.dumps(source) + b"," + payload[1:]
@@ -0,0 +1,122 @@
+from __future__ import annotations
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from redis.asyncio import Redis
+
+from ..logger_manager import LoggerManager
+from ..task_manager import TaskManager
+
+INVALIDATION_CHANNEL = "collection_cache_invalidation"
+
+
+class CollectionCache:
+    """
+    In-Process L1 Cache (pro Worker) vor dem Redis Cache.
+    Hält die fertig serialisierte Antwort von `get_items` mit TTL und LRU-Verdrängung.
+    Die Worker halten sich gegenseitig über einen Redis pub/sub Channel kohärent.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(CollectionCache, cls).__new__(cls, *args, **kwargs)
+            cls._instance._setup()
+        return cls._instance
+
+    def _setup(self):
+        logger_instance = LoggerManager()
+        self.logger = logger_instance.get_logger("Collection Cache")
+        self.max_entries = int(os.getenv("LOCAL_CACHE_SIZE", "1000"))
+        self.ttl = float(os.getenv("LOCAL_CACHE_TTL", "5"))
+
+        self.entries: OrderedDict[Tuple[str, str], Tuple[float, bytes]] = OrderedDict()
+        self.keys_of_collection: Dict[str, Set[Tuple[str, str]]] = {}
+        self.versions: Dict[str, int] = {}
+        self.listener_task: Optional[asyncio.Task] = None
+        self.taskManager = TaskManager()
+
+    async def init(self, redis: Redis):
+        self.redis = redis
+        self.listener_task = self.taskManager.create_task(self.listen_for_invalidations())
+
+    async def shutdown(self):
+        if self.listener_task:
+            self.listener_task.cancel()
+            self.listener_task = None
+
+    # ------------------- cache -------------------
+
+    def get_version(self, collection_id: str) -> int:
+        return self.versions.get(collection_id, 0)
+
+    def get(self, collection_id: str, variant: str) -> Optional[bytes]:
+        key = (collection_id, variant)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return payload
+
+    def set(self, collection_id: str, variant: str, payload: bytes, version: int):
+        # Zwischenzeitlich invalidiert -> veraltete Daten nicht mehr übernehmen
+        if self.ttl <= 0 or version != self.get_version(collection_id):
+            return
+
+        key = (collection_id, variant)
+        self.entries[key] = (time.monotonic() + self.ttl, payload)
+        self.entries.move_to_end(key)
+        self.keys_of_collection.setdefault(collection_id, set()).add(key)
+
+        while len(self.entries) > self.max_entries:
+            oldest_key = next(iter(self.entries))
+            self._remove(oldest_key)
+
+    def invalidate(self, collection_id: str):
+        self.versions[collection_id] = self.get_version(collection_id) + 1
+
+        for key in self.keys_of_collection.pop(collection_id, set()):
+            self.entries.pop(key, None)
+
+    def clear(self):
+        for collection_id in list(self.keys_of_collection.keys()):
+            self.invalidate(collection_id)
+
+    def _remove(self, key: Tuple[str, str]):
+        self.entries.pop(key, None)
+        keys = self.keys_of_collection.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_of_collection[key[0]]
+
+    # ------------------- pub/sub -------------------
+
+    async def listen_for_invalidations(self):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                self.logger.debug(f"subscribed to {INVALIDATION_CHANNEL}")
+
+                async for message in pubsub.listen():
+                    self.invalidate(message["data"])
+
+            except asyncio.CancelledError:
+                self.logger.info("Collection cache invalidation listener cancelled.")
+                break
+            except Exception as e:
+                # Nachrichten können während eines Reconnects verloren gehen
+                self.logger.error(f"Error in collection cache invalidation listener: {e}")
+                self.clear()
+                await asyncio.sleep(0.3)
+            finally:
+                await pubsub.aclose()
@@ -0,0 +1,90 @@
+from typing import Dict, List
+from itertools import groupby
+
+
+def remove_not_important_changes(items_events_grouped) -> list[Dict]:
+    data = []
+    for collection_id, item_events in items_events_grouped.items():
+        created = None
+        edited = None
+        removed = None
+
+        for item_event in item_events:
+            match item_event["event"]:
+                case "created":
+                    created = item_event
+                case "edited":
+                    edited = item_event
+                case "removed":
+                    removed = item_event
+                case _:  # default case
+                    raise ValueError(f"unknown event: {item_event['event']}")
+
+        if created is not None and edited is not None and removed is None:
+            data.append(created)
+            data.append(edited)
+
+        elif created is not None and edited is None and removed is None:
+            data.append(created)
+
+        elif created is None and edited is not None and removed is None:
+            data.append(edited)
+
+        elif created is None and removed is not None:
+            data.append(removed)
+
+    return data
+
+
+def group_and_sort_changes(items: list[Dict]) -> Dict:
+    items_sorted = sorted(items, key=lambda x: (x["item"]["id"], x["timestamp"]))
+
+    return {
+        _id: list(group)
+        for _id, group in groupby(items_sorted, key=lambda x: (x["item"]["id"]))
+    }
+
+def build_compact_changes_pipeline(mongo_filter: Dict) -> List[Dict]:
+    """
+    Aggregation mit dem gleichen Ergebnis wie `group_and_sort_changes` + `remove_not_important_changes`:
+    pro Item jeweils das letzte created/edited/removed Event, sortiert nach Item-ID.
+    """
+    def last_event(event: str) -> Dict:
+        # pro (Item, Event) gibt es nach der ersten Gruppierung höchstens ein Dokument, null < Dokument
+        return {"$max": {"$cond": [{"$eq": ["$_id.event", event]}, "$event_doc", None]}}
+
+    def exists(field: str) -> Dict:
+        return {"$ne": [f"${field}", None]}
+
+    def missing(field: str) -> Dict:
+        return {"$eq": [f"${field}", None]}
+
+    return [
+        {"$match": mongo_filter},
+        # Events mit gleichem Zeitstempel behalten ihre Einfügereihenfolge
+        {"$sort": {"item._id": 1, "timestamp": 1, "_id": 1}},
+        {"$group": {
+            "_id": {"item": "$item._id", "event": "$event"},
+            "event_doc": {"$last": "$$ROOT"},
+        }},
+        {"$group": {
+            "_id": "$_id.item",
+            "created": last_event("created"),
+            "edited": last_event("edited"),
+            "removed": last_event("removed"),
+        }},
+        {"$project": {
+            "changes": {"$switch": {
+                "branches": [
+                    {"case": {"$and": [exists("created"), exists("edited"), missing("removed")]}, "then": ["$created", "$edited"]},
+                    {"case": {"$and": [exists("created"), missing("edited"), missing("removed")]}, "then": ["$created"]},
+                    {"case": {"$and": [missing("created"), exists("edited"), missing("removed")]}, "then": ["$edited"]},
+                    {"case": {"$and": [missing("created"), exists("removed")]}, "then": ["$removed"]},
+                ],
+                "default": [],
+            }},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$unwind": "$changes"},
+        {"$replaceRoot": {"newRoot": "$changes"}},
+    ]
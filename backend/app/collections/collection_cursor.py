@@ -0,0 +1,161 @@
+import base64
+import binascii
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId, json_util, Binary, Decimal128, Int64, MaxKey, MinKey, Regex, Timestamp
+from bson.errors import InvalidId
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from fastapi import HTTPException, status
+from pymongo import ASCENDING
+
+SortSpec = List[Tuple[str, int]]
+
+# Cursor ab diesem Format enthalten alle Werte, auch die _id, mit ihrem BSON-Typ (Extended JSON)
+CURSOR_FORMAT = 2
+
+# Sortierreihenfolge der BSON-Typen in MongoDB (null und fehlende Felder behandelt `build_after_condition` selbst).
+# $gt/$lt vergleichen nur Werte derselben Gruppe, Werte anderer Typen werden über $type einbezogen.
+TYPE_ORDER = [
+    ["minKey"],
+    ["int", "long", "double", "decimal"],
+    ["symbol", "string"],
+    ["object"],
+    ["array"],
+    ["binData"],
+    ["objectId"],
+    ["bool"],
+    ["date"],
+    ["timestamp"],
+    ["regex"],
+    ["maxKey"],
+]
+
+
+def build_sort_spec(sort: Dict) -> SortSpec:
+    """Sortierung aus `parse_filter_string` plus `_id` als eindeutiger Tie-Breaker."""
+    sort_spec = [(field, direction) for field, direction in sort.items() if field != "_id"]
+    sort_spec.append(("_id", sort.get("_id", ASCENDING)))
+    return sort_spec
+
+
+def get_field_value(item: Dict, field: str) -> Any:
+    # Pfade wie "item.price" Segment für Segment auflösen, fehlende Felder sind wie in MongoDB null
+    value = item
+    for segment in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(segment)
+    return value
+
+
+def encode_cursor(item: Dict, sort_spec: SortSpec) -> str:
+    """Opaker Cursor aus den Sortierwerten und der `_id` des letzten Items einer Seite."""
+    # Extended JSON, damit datetime, ObjectId, Decimal128 usw. mit ihrem BSON-Typ verglichen werden
+    values = [get_field_value(item, field) for field, _ in sort_spec]
+    payload = json_util.dumps({"f": CURSOR_FORMAT, "s": [field for field, _ in sort_spec], "v": values}, json_options=CANONICAL_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_spec: SortSpec) -> List:
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)), json_options=CANONICAL_JSON_OPTIONS)
+        fields, values = payload["s"], payload["v"]
+
+        if fields != [field for field, _ in sort_spec] or len(values) != len(sort_spec):
+            raise ValueError("cursor does not match sort")
+
+        # ältere Cursor enthalten die _id als String ohne Typ, neuere z. B. {"$oid": ...} oder eine String-_id
+        if payload.get("f") is None:
+            values[-1] = ObjectId(values[-1])
+        return values
+    except (binascii.Error, UnicodeDecodeError, KeyError, TypeError, ValueError, InvalidId):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def get_type_group(value) -> Optional[int]:
+    # bool vor int prüfen, bool ist in Python ein int
+    match value:
+        case MinKey():
+            return 0
+        case bool():
+            return 7
+        case int() | float() | Int64() | Decimal128() | Decimal():
+            return 1
+        case str():
+            return 2
+        case dict():
+            return 3
+        case list() | tuple():
+            return 4
+        case bytes() | Binary():
+            return 5
+        case ObjectId():
+            return 6
+        case datetime():
+            return 8
+        case Timestamp():
+            return 9
+        case Regex() | re.Pattern():
+            return 10
+        case MaxKey():
+            return 11
+    return None
+
+
+def build_after_condition(field: str, direction: int, value) -> Optional[Dict]:
+    """
+    Bedingung "field liegt in Sortierrichtung hinter value". MongoDB sortiert null und fehlende Felder
+    vor allen anderen Werten, mit $gt/$lt sind sie aber nicht vergleichbar. Ebenso vergleichen $gt/$lt nur
+    Werte desselben Typs, Items mit einem anderen Typ im Sortierfeld werden über `TYPE_ORDER` einbezogen.
+    Nicht unterstützt: Sortierfelder mit Arrays (MongoDB sortiert nach dem kleinsten bzw. größten Element).
+    """
+    group = get_type_group(value)
+
+    if direction == ASCENDING:
+        if value is None:
+            return {field: {"$ne": None}}
+
+        later_types = [bson_type for types in TYPE_ORDER[group + 1:] for bson_type in types] if group is not None else []
+        if not later_types:
+            return {field: {"$gt": value}}
+        return {"$or": [{field: {"$gt": value}}, {field: {"$type": later_types}}]}
+
+    if value is None:
+        # absteigend kommt nach null nichts mehr
+        return None
+
+    earlier_types = [bson_type for types in TYPE_ORDER[:group] for bson_type in types] if group is not None else []
+    conditions = [{field: {"$lt": value}}]
+    if earlier_types:
+        conditions.append({field: {"$type": earlier_types}})
+    conditions.append({field: None})
+    return {"$or": conditions}
+
+
+def build_keyset_filter(sort_spec: SortSpec, values: List) -> Dict:
+    """
+    Bedingung für alle Items nach dem Cursor, z. B. für (price asc, _id asc):
+    price > v0 ODER (price == v0 UND _id > v1)
+    Gleichheit mit null ({"price": None}) trifft auch Items ohne das Feld.
+    """
+    conditions = []
+    for i, (field, direction) in enumerate(sort_spec):
+        after_condition = build_after_condition(field, direction, values[i])
+        if after_condition is None:
+            continue
+
+        condition = {previous_field: values[j] for j, (previous_field, _) in enumerate(sort_spec[:i])}
+        condition.update(after_condition)
+        conditions.append(condition)
+
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+
+def apply_cursor(mongo_filter: Dict, sort_spec: SortSpec, after: Optional[str]) -> Dict:
+    if not after:
+        return mongo_filter
+
+    keyset_filter = build_keyset_filter(sort_spec, decode_cursor(after, sort_spec))
+    return {"$and": [mongo_filter, keyset_filter]} if mongo_filter else keyset_filter
@@ -1,68 +1,327 @@
-
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Tuple
+from fastapi import HTTPException, status
 from pymongo import ASCENDING, DESCENDING
 
-def parse_filter_string(filter_string: str):
-    OPERATORS = {
-        ">=": "$gte",
-        "<=": "$lte",
-        "!=": "$ne",
-        ">": "$gt",
-        "<": "$lt",
-        "=": "$eq",
-        ":": "$eq"
-    }
-
-    filters = {}
-    if not filter_string:
-        return filters
+# längere Operatoren zuerst, damit ">=" nicht als ">" erkannt wird
+OPERATORS = {
+    ">=": "$gte",
+    "<=": "$lte",
+    "!=": "$ne",
+    "^=": "$regex",
+    "~=": "$regex",
+    ">": "$gt",
+    "<": "$lt",
+    "=": "$eq",
+    ":": "$eq",
+}
+
+FIELD_END = set("<>=!:^~,")
+QUERY_PLAN_CACHE_SIZE = int(os.getenv("QUERY_PLAN_CACHE_SIZE", "4096"))
+
+
+class FilterParseError(ValueError):
+    def __init__(self, message: str, position: int, filter_string: str):
+        super().__init__(message)
+        self.message = message
+        self.position = position
+        self.filter_string = filter_string
+
 
-    for part in filter_string.split(","):
-        matched = False
-        for symbol in sorted(OPERATORS.keys(), key=len, reverse=True):
-            if symbol in part:
-                field, value = part.split(symbol, 1)
-                field = field.strip()
-                value = value.strip()
-
-                # Typ-Konvertierung
-                lower_val = value.lower()
-                if lower_val == "true":
-                    value = True
-                elif lower_val == "false":
-                    value = False
-                elif lower_val == "asc":
-                    value = ASCENDING
-                elif lower_val == "desc":
-                    value = DESCENDING
+class Condition(NamedTuple):
+    field: str
+    operator: str
+    value: Any
+
+
+class QueryPlan(NamedTuple):
+    """Unveränderlicher, kompilierter Filter- bzw. Sort-String."""
+    conditions: Tuple[Condition, ...]
+
+    def to_mongo(self) -> Dict:
+        # bei jedem Aufruf ein neues Dict, damit der gecachte Plan nicht verändert werden kann
+        filters = {}
+        for field, mongo_op, value in self.conditions:
+            if isinstance(value, tuple):
+                value = list(value)
+
+            if field in filters:
+                if isinstance(filters[field], dict):
+                    filters[field][mongo_op] = value
                 else:
-                    try:
-                        if "." in value:
-                            value = float(value)
-                        else:
-                            value = int(value)
-                    except ValueError:
-                        pass
-
-                mongo_op = OPERATORS[symbol]
-
-                if field in filters:
-                    if isinstance(filters[field], dict):
-                        filters[field][mongo_op] = value
-                    else:
-                        filters[field] = {
-                            "$eq": filters[field],
-                            mongo_op: value
-                        }
+                    filters[field] = {
+                        "$eq": filters[field],
+                        mongo_op: value
+                    }
+            else:
+                if mongo_op == "$eq":
+                    filters[field] = value
                 else:
-                    if mongo_op == "$eq":
-                        filters[field] = value
-                    else:
-                        filters[field] = {mongo_op: value}
+                    filters[field] = {mongo_op: value}
+
+        return filters
+
 
-                matched = True
+def convert_value(value: str) -> Any:
+    # Typ-Konvertierung
+    lower_val = value.lower()
+    if lower_val == "true":
+        return True
+    elif lower_val == "false":
+        return False
+    elif lower_val == "asc":
+        return ASCENDING
+    elif lower_val == "desc":
+        return DESCENDING
+    else:
+        try:
+            if "." in value:
+                return float(value)
+            else:
+                return int(value)
+        except ValueError:
+            return value
+
+
+def is_range_bound(value: str) -> bool:
+    # nur Zahlen und Zeitstempel, damit Texte wie "Nudeln..." exakt verglichen werden
+    converted = convert_value(value)
+    if isinstance(converted, (int, float)) and not isinstance(converted, bool):
+        return True
+
+    try:
+        datetime.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+
+class FilterParser:
+    """
+    Tokenizer/Parser für Filter- und Sort-Strings, z. B.
+    `price>=2,price<7,label=[red,green],name^=Ap,note="a, b",price=2..7`
+
+    Listen, Anführungszeichen und Bereiche gibt es nur mit "=" und den anderen Operatoren,
+    ":" vergleicht wie bisher exakt mit dem Text bis zum nächsten Komma.
+    """
+
+    def __init__(self, filter_string: str):
+        self.text = filter_string
+        self.pos = 0
+
+    def error(self, message: str, position: int | None = None):
+        raise FilterParseError(message, self.pos if position is None else position, self.text)
+
+    def peek(self) -> str:
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def skip_whitespace(self):
+        while self.peek().isspace():
+            self.pos += 1
+
+    def parse(self) -> QueryPlan:
+        conditions = []
+
+        while self.pos < len(self.text):
+            self.skip_whitespace()
+
+            # leere Teile wie in "a=1,,b=2" ignorieren
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            if not self.peek():
                 break
 
-        if not matched:
-            print(f"⚠️ Ungültiger Filterteil: {part}")
+            conditions.extend(self.parse_part())
+
+            self.skip_whitespace()
+            if self.peek() == ",":
+                self.pos += 1
+            elif self.peek():
+                self.error(f"unexpected character '{self.peek()}'")
+
+        return QueryPlan(tuple(conditions))
+
+    def parse_part(self) -> Tuple[Condition, ...]:
+        field = self.parse_field()
+        operator = self.parse_operator()
+        self.skip_whitespace()
+
+        if operator == ":":
+            return (self.condition(field, operator, self.parse_bare(","), quoted=False),)
+
+        match self.peek():
+            case "[":
+                values = self.parse_list()
+                return (self.list_condition(field, operator, values),)
+            case '"' | "'":
+                value = self.parse_quoted()
+                return (self.condition(field, operator, value, quoted=True),)
+            case _:
+                raw_value = self.parse_bare(",")
+                if ".." in raw_value and operator == "=":
+                    conditions = self.range_conditions(field, raw_value)
+                    if conditions:
+                        return conditions
+                return (self.condition(field, operator, raw_value, quoted=False),)
+
+    def parse_field(self) -> str:
+        start = self.pos
+        while self.peek() and not self.is_operator_start():
+            if self.peek() == ",":
+                self.error(f"missing operator in '{self.text[start:self.pos].strip()}'", start)
+            self.pos += 1
+
+        field = self.text[start:self.pos].strip()
+        if not self.peek():
+            self.error(f"missing operator in '{field}'", start)
+        if not field:
+            self.error("missing field name", start)
+        return field
+
+    def is_operator_start(self) -> bool:
+        char = self.peek()
+        if char in ("^", "~", "!"):
+            return self.text[self.pos + 1:self.pos + 2] == "="
+        return char in FIELD_END and char != ","
+
+    def parse_operator(self) -> str:
+        for symbol in OPERATORS:
+            if self.text.startswith(symbol, self.pos):
+                self.pos += len(symbol)
+                return symbol
+        self.error("missing operator")
+
+    def parse_quoted(self) -> str:
+        quote = self.peek()
+        start = self.pos
+        self.pos += 1
+        chars = []
+
+        while True:
+            char = self.peek()
+            if not char:
+                self.error("unterminated quoted value", start)
+            self.pos += 1
+
+            if char == "\\":
+                escaped = self.peek()
+                if not escaped:
+                    self.error("unterminated quoted value", start)
+                chars.append(escaped)
+                self.pos += 1
+            elif char == quote:
+                return "".join(chars)
+            else:
+                chars.append(char)
+
+    def parse_bare(self, terminators: str) -> str:
+        start = self.pos
+        while self.peek() and self.peek() not in terminators:
+            self.pos += 1
+        return self.text[start:self.pos].strip()
+
+    def parse_list(self) -> Tuple[Any, ...]:
+        start = self.pos
+        self.pos += 1
+        values = []
+
+        while True:
+            self.skip_whitespace()
+            char = self.peek()
+
+            if not char:
+                self.error("unterminated list", start)
+            if char == "]" and not values:
+                self.pos += 1
+                return tuple(values)
+
+            if char in ('"', "'"):
+                values.append(self.parse_quoted())
+            else:
+                raw_value = self.parse_bare(",]")
+                if not raw_value:
+                    self.error("empty list value")
+                values.append(convert_value(raw_value))
+
+            self.skip_whitespace()
+            if self.peek() == ",":
+                self.pos += 1
+            elif self.peek() == "]":
+                self.pos += 1
+                return tuple(values)
+            elif not self.peek():
+                self.error("unterminated list", start)
+            else:
+                self.error(f"unexpected character '{self.peek()}' in list")
+
+    def condition(self, field: str, operator: str, value: str, quoted: bool) -> Condition:
+        match operator:
+            case "^=":
+                return Condition(field, "$regex", "^" + re.escape(value))
+            case "~=":
+                try:
+                    re.compile(value)
+                except re.error as e:
+                    self.error(f"invalid regular expression: {e}")
+                return Condition(field, "$regex", value)
+            case _:
+                return Condition(field, OPERATORS[operator], value if quoted else convert_value(value))
+
+    def list_condition(self, field: str, operator: str, values: Tuple[Any, ...]) -> Condition:
+        match operator:
+            case "=":
+                return Condition(field, "$in", values)
+            case "!=":
+                return Condition(field, "$nin", values)
+            case _:
+                self.error(f"operator '{operator}' does not support lists")
+
+    def range_conditions(self, field: str, raw_value: str) -> Tuple[Condition, ...]:
+        """Leer, wenn `raw_value` kein Bereich aus Zahlen oder Zeitstempeln ist."""
+        lower, upper = (part.strip() for part in raw_value.split("..", 1))
+        bounds = [bound for bound in (lower, upper) if bound]
+        if not bounds or not all(is_range_bound(bound) for bound in bounds):
+            return ()
+
+        conditions = []
+        if lower:
+            conditions.append(Condition(field, "$gte", convert_value(lower)))
+        if upper:
+            conditions.append(Condition(field, "$lte", convert_value(upper)))
+        return tuple(conditions)
+
+
+@lru_cache(maxsize=QUERY_PLAN_CACHE_SIZE)
+def compile_query_plan(filter_string: str) -> QueryPlan:
+    return FilterParser(filter_string).parse()
+
+
+def parse_filter_string(filter_string: str):
+    if not filter_string:
+        return {}
+
+    try:
+        return compile_query_plan(filter_string).to_mongo()
+    except FilterParseError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": e.message, "position": e.position, "filter": e.filter_string}
+        )
+
+
+def parse_sort_string(sort_string: str):
+    sort = parse_filter_string(sort_string)
+
+    for field, direction in sort.items():
+        # bool ist ein int, "price=true" ist aber keine Richtung
+        if type(direction) is not int or direction not in (ASCENDING, DESCENDING):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "sort direction must be asc, desc, 1 or -1", "field": field, "sort": sort_string}
+            )
 
-    return filters
+    return sort
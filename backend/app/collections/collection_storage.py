@@ -0,0 +1,118 @@
+import os
+from typing import Dict, List, Optional
+from pymongo import InsertOne, UpdateOne, DeleteOne
+from pymongo.collection import Collection
+
+# "collections": zwei MongoDB-Collections pro Liste ({id} und {id}_events)
+# "shared": alle Items in `items` und alle Events in `item_events`, unterschieden über `collection_id`
+COLLECTION_STORAGE_MODE = os.getenv("COLLECTION_STORAGE_MODE", "collections")
+SHARED_ITEMS_COLLECTION = "items"
+SHARED_EVENTS_COLLECTION = "item_events"
+SCOPE_FIELD = "collection_id"
+
+# Speicherort einer Liste im Modus "shared" (Feld `storage` in users_collections): ohne Feld noch in den
+# eigenen Collections, "migrating" während die Migration sie kopiert (Schreibzugriffe werden abgelehnt), danach "shared"
+STORAGE_MIGRATING = "migrating"
+STORAGE_SHARED = "shared"
+
+
+def is_shared_storage() -> bool:
+    return COLLECTION_STORAGE_MODE == "shared"
+
+
+class ScopedCollection:
+    """
+    Sicht auf die Items oder Events einer Liste, unabhängig vom Speichermodus.
+    Im Modus "shared" wird jede Abfrage auf `collection_id` eingeschränkt, jedes Dokument
+    beim Schreiben damit markiert und das Feld beim Lesen wieder entfernt.
+    Im Modus "collections" werden alle Aufrufe unverändert weitergereicht.
+    """
+
+    def __init__(self, collection: Collection, collection_id: Optional[str] = None):
+        self.collection = collection
+        self.scope_filter = {SCOPE_FIELD: collection_id} if collection_id else {}
+
+    @property
+    def name(self) -> str:
+        return self.collection.name
+
+    @property
+    def is_scoped(self) -> bool:
+        return bool(self.scope_filter)
+
+    def scope(self, mongo_filter: Optional[Dict] = None) -> Dict:
+        # Scope zuletzt, damit ein Filter auf collection_id nicht aus der Liste herausführt
+        return (mongo_filter or {}) | self.scope_filter
+
+    def scope_document(self, document: Dict) -> Dict:
+        document.update(self.scope_filter)
+        return document
+
+    def scope_update(self, update: Dict) -> Dict:
+        # collection_id darf über den Body eines Updates nicht geändert werden, sonst wandert das Item in eine andere Liste
+        if not self.scope_filter:
+            return update
+
+        def is_scope_field(field: str) -> bool:
+            return field == SCOPE_FIELD or field.startswith(f"{SCOPE_FIELD}.")
+
+        return {
+            operator: {field: value for field, value in fields.items() if not is_scope_field(field)}
+            if isinstance(fields, dict) else fields
+            for operator, fields in update.items()
+        }
+
+    def unscope(self, document: Optional[Dict]) -> Optional[Dict]:
+        if document is not None and self.scope_filter:
+            document.pop(SCOPE_FIELD, None)
+        return document
+
+    def projection(self, projection: Optional[Dict]):
+        # eigene Projektionen (z. B. {"item._id": 1}) enthalten collection_id ohnehin nicht
+        if projection is None and self.scope_filter:
+            return {SCOPE_FIELD: 0}
+        return projection
+
+    def find(self, mongo_filter: Optional[Dict] = None, projection: Optional[Dict] = None, session=None):
+        return self.collection.find(self.scope(mongo_filter), self.projection(projection), session=session)
+
+    async def find_one(self, mongo_filter: Dict, projection: Optional[Dict] = None, session=None) -> Optional[Dict]:
+        return await self.collection.find_one(self.scope(mongo_filter), self.projection(projection), session=session)
+
+    async def find_one_and_update(self, mongo_filter: Dict, update: Dict, **kwargs) -> Optional[Dict]:
+        kwargs["projection"] = self.projection(kwargs.get("projection"))
+        return await self.collection.find_one_and_update(self.scope(mongo_filter), self.scope_update(update), **kwargs)
+
+    async def find_one_and_delete(self, mongo_filter: Dict, **kwargs) -> Optional[Dict]:
+        kwargs["projection"] = self.projection(kwargs.get("projection"))
+        return await self.collection.find_one_and_delete(self.scope(mongo_filter), **kwargs)
+
+    async def insert_one(self, document: Dict, session=None):
+        result = await self.collection.insert_one(self.scope_document(document), session=session)
+        self.unscope(document)
+        return result
+
+    async def insert_many(self, documents: List[Dict], ordered: bool = True, session=None):
+        result = await self.collection.insert_many([self.scope_document(document) for document in documents], ordered=ordered, session=session)
+        for document in documents:
+            self.unscope(document)
+        return result
+
+    def insert_request(self, document: Dict) -> InsertOne:
+        # nach `bulk_write` muss `unscope(document)` aufgerufen werden
+        return InsertOne(self.scope_document(document))
+
+    def update_request(self, mongo_filter: Dict, update: Dict) -> UpdateOne:
+        return UpdateOne(self.scope(mongo_filter), self.scope_update(update))
+
+    def delete_request(self, mongo_filter: Dict) -> DeleteOne:
+        return DeleteOne(self.scope(mongo_filter))
+
+    async def bulk_write(self, requests: List, ordered: bool = True, session=None):
+        return await self.collection.bulk_write(requests, ordered=ordered, session=session)
+
+    def aggregate(self, pipeline: List[Dict], **kwargs):
+        if self.scope_filter:
+            # aufeinanderfolgende $match Stages fasst MongoDB zusammen, der Index auf collection_id wird genutzt
+            pipeline = [{"$match": self.scope_filter}] + pipeline + [{"$unset": SCOPE_FIELD}]
+        return self.collection.aggregate(pipeline, **kwargs)
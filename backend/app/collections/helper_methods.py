@@ -1,11 +1,23 @@
 from fastapi import HTTPException, Depends, APIRouter, status
-from pymongo import ASCENDING
+from pymongo import ASCENDING, ReturnDocument
 from pymongo.collection import Collection
-from typing import Dict
-from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from datetime import datetime, timedelta, timezone
+import os
+import asyncio
+import time
 
 from ..logger_manager import LoggerManager
 from ..database_manager import get_db, get_redis
+from .collection_cache import CollectionCache, INVALIDATION_CHANNEL
+from .collection_storage import ScopedCollection, is_shared_storage, SHARED_ITEMS_COLLECTION, SHARED_EVENTS_COLLECTION, \
+    SCOPE_FIELD, STORAGE_SHARED
+
+SEQ_PENDING_TIMEOUT = float(os.getenv("SEQ_PENDING_TIMEOUT", "60"))
+# länger als jeder gecachte Eintrag (cache_time), wird bei jeder Invalidierung verlängert
+CACHE_GENERATION_TTL = int(os.getenv("CACHE_GENERATION_TTL", "86400"))
+# interne Felder des users_collections Dokuments, die nicht an Clients gehen
+PUBLIC_COLLECTION_PROJECTION = {"_id": 0, "seq": 0, "pending_seq": 0, "storage": 0}
 
 # Logging
 logger_instance = LoggerManager()
@@ -21,8 +33,43 @@ async def get_collection_by_id(collection_id: str) -> Collection:
 
     return collection
 
-async def get_collection_info(collection_id) -> Dict:
-    collection_info = await get_db().users_collections.find_one({"id": collection_id})
+# Listen, die schon in den gemeinsamen Collections liegen. Das ändert sich nie zurück, deshalb reicht ein Set pro Worker
+shared_collection_ids: Set[str] = set()
+
+async def uses_shared_storage(collection_id: str) -> bool:
+    """Im Modus "shared" bis zum Ende ihrer Migration (siehe migration_service.py) noch die eigenen Collections der Liste."""
+    if not is_shared_storage():
+        return False
+    if collection_id in shared_collection_ids:
+        return True
+
+    collection_info = await get_db().users_collections.find_one({"id": collection_id}, {"storage": 1})
+    if collection_info is None:
+        return True
+    if collection_info.get("storage") != STORAGE_SHARED:
+        return False
+
+    shared_collection_ids.add(collection_id)
+    return True
+
+def get_storage_filter(shared: bool) -> Dict:
+    # passt nur, solange die Liste noch dort liegt, wo der Request sie gelesen hat
+    if not is_shared_storage():
+        return {}
+    return {"storage": STORAGE_SHARED} if shared else {"storage": {"$exists": False}}
+
+async def get_items_collection(collection_id: str) -> ScopedCollection:
+    if await uses_shared_storage(collection_id):
+        return ScopedCollection(get_db()[SHARED_ITEMS_COLLECTION], collection_id)
+    return ScopedCollection(await get_collection_by_id(collection_id))
+
+async def get_events_collection(collection_id: str) -> ScopedCollection:
+    if await uses_shared_storage(collection_id):
+        return ScopedCollection(get_db()[SHARED_EVENTS_COLLECTION], collection_id)
+    return ScopedCollection(await get_collection_by_id(f"{collection_id}_events"))
+
+async def get_collection_info(collection_id, projection: Optional[Dict] = None) -> Dict:
+    collection_info = await get_db().users_collections.find_one({"id": collection_id}, projection)
 
     if collection_info is None:
         logger.warning(f"Collection info {collection_id} not found")
@@ -49,49 +96,184 @@ async def get_collection_id(collection_name, user_id, should_exist: bool = True)
 
     return collection["id"] if collection else None
 
+async def create_shared_collection_indexes():
+    db = get_db()
+    # collection_id immer als erstes Feld, passend zu einem späteren Shard Key {collection_id: 1, _id: 1}
+    await db[SHARED_ITEMS_COLLECTION].create_index([(SCOPE_FIELD, ASCENDING), ("_id", ASCENDING)])
+    await db[SHARED_ITEMS_COLLECTION].create_index([(SCOPE_FIELD, ASCENDING), ("seq", ASCENDING)])
+    await db[SHARED_EVENTS_COLLECTION].create_index([(SCOPE_FIELD, ASCENDING), ("timestamp", ASCENDING)])
+    await db[SHARED_EVENTS_COLLECTION].create_index([(SCOPE_FIELD, ASCENDING), ("seq", ASCENDING)])
+
 async def create_collection(collection_id: str, index: str | None):
     db = get_db()
+
+    if is_shared_storage():
+        # keine eigenen MongoDB-Collections und keine Indexe pro Liste, MongoDB erlaubt nur 64 Indexe pro Collection.
+        # Indexe für `items` empfiehlt der Index Advisor (/admin/indexes/recommendations)
+        if(index):
+            logger.info(f"index {index} of collection {collection_id} not created in shared storage mode")
+        return
+
     # Collection erstellen
     await db.create_collection(collection_id)
 
     if(index):
         await db[collection_id].create_index([(index, ASCENDING)])
 
+    # Index für die Delta-Synchronisation
+    await db[collection_id].create_index([("seq", ASCENDING)])
+
     # Collection für events erstellen
     events_collection_id = f"{collection_id}_events"
     await db.create_collection(events_collection_id)
     await db[events_collection_id].create_index([("timestamp", ASCENDING)])
+    await db[events_collection_id].create_index([("seq", ASCENDING)])
 
 async def delete_collection(collectionId: str):
     db = get_db()
+
+    if is_shared_storage():
+        await db[SHARED_ITEMS_COLLECTION].delete_many({SCOPE_FIELD: collectionId})
+        await db[SHARED_EVENTS_COLLECTION].delete_many({SCOPE_FIELD: collectionId})
+        # noch nicht migrierte Listen liegen weiterhin in eigenen Collections
+
     await db.drop_collection(collectionId)
         # delete events list
     await db.drop_collection(f"{collectionId}_events")
 
-async def update_modified_status_of_collection(collection_id):
-    key_pattern = f"collection_cache:{collection_id}*"
+    await invalidate_collection_cache(collectionId, deleted=True)
+
+def get_cache_generation_key(collection_id: str) -> str:
+    return f"collection_generation:{collection_id}"
+
+async def get_cache_generation(collection_id: str) -> int:
     redis = get_redis()
+    generation_key = get_cache_generation_key(collection_id)
+
+    generation = await redis.get(generation_key)
+    if generation is None:
+        # Startwert zeitbasiert wählen, damit nach einer Eviction oder dem Ablauf keine alten Cache-Keys wieder gültig werden
+        await redis.set(generation_key, time.time_ns(), nx=True, ex=CACHE_GENERATION_TTL)
+        generation = await redis.get(generation_key)
+
+    return int(generation)
+
+async def invalidate_collection_cache(collection_id: str, deleted: bool = False):
+    # O(1): neue Generation -> alle alten Cache-Varianten sind nicht mehr erreichbar und laufen über ihre TTL aus
+    generation_key = get_cache_generation_key(collection_id)
+    CollectionCache().invalidate(collection_id)
 
-    keys = await redis.keys(key_pattern)
-    if keys:
-        await redis.delete(*keys)
+    async with get_redis().pipeline(transaction=False) as pipe:
+        if deleted:
+            # gelöschte Liste: Generation entfernen statt erhöhen, sonst bleibt pro Liste ein Key in Redis
+            pipe.delete(generation_key)
+        else:
+            pipe.set(generation_key, time.time_ns(), nx=True, ex=CACHE_GENERATION_TTL)
+            pipe.incr(generation_key)
+            pipe.expire(generation_key, CACHE_GENERATION_TTL)
+        # L1 Caches der anderen Worker invalidieren
+        pipe.publish(INVALIDATION_CHANNEL, collection_id)
+        await pipe.execute()
 
+async def set_last_modified(collection_id: str, session=None):
     await get_db().users_collections.update_one(
         {"id": collection_id},
-        {"$set": {"last_modified": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")}}
+        {"$set": {"last_modified": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")}},
+        session=session
+    )
+
+async def update_modified_status_of_collection(collection_id):
+    # Cache-Invalidierung (Redis) und Änderungsdatum (MongoDB) sind unabhängig voneinander
+    await asyncio.gather(
+        invalidate_collection_cache(collection_id),
+        set_last_modified(collection_id)
     )
     logger.info(f"Collection info from {collection_id} updated")
 
 
-async def add_item_event(collection_id: str, event: str, item: Dict):
+async def next_sequence_number(collection_id: str, count: int = 1, session=None, shared: bool = False) -> int:
+    """
+    Reserviert `count` aufeinanderfolgende Sequenznummern der Collection und gibt die erste zurück.
+    Die Reservierung bleibt in `pending_seq`, bis `release_sequence_numbers` nach dem Schreiben aufgerufen wird.
+    `shared`: ob der Request die gemeinsamen Collections verwendet. Wird die Liste gerade migriert (oder ist sie
+    inzwischen umgezogen), wird der Schreibzugriff mit 503 abgelehnt.
+    """
+    collection_info = await get_db().users_collections.find_one_and_update(
+        {"id": collection_id} | get_storage_filter(shared),
+        [
+            {"$set": {"seq": {"$add": [{"$ifNull": ["$seq", 0]}, count]}}},
+            {"$set": {"pending_seq": {"$concatArrays": [
+                {"$ifNull": ["$pending_seq", []]},
+                [{"seq": {"$subtract": ["$seq", count - 1]}, "at": "$$NOW"}]
+            ]}}},
+        ],
+        projection={"seq": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+
+    if collection_info is None:
+        if await get_db().users_collections.count_documents({"id": collection_id}, limit=1, session=session):
+            logger.warning(f"Collection {collection_id} is being migrated")
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Collection is being migrated", headers={"Retry-After": "1"})
+
+        logger.warning(f"Collection info {collection_id} not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Collection not found")
+
+    return collection_info["seq"] - count + 1
+
+async def release_sequence_numbers(collection_id: str, first_seqs: List[int]):
+    """Gibt Reservierungen frei, deren Änderungen geschrieben (oder verworfen) sind."""
+    if first_seqs:
+        await get_db().users_collections.update_one(
+            {"id": collection_id},
+            {"$pull": {"pending_seq": {"seq": {"$in": first_seqs}}}}
+        )
+
+def get_committed_seq(collection_info: Dict) -> int:
+    """
+    Höchste Sequenznummer, bis zu der alle Änderungen geschrieben sind. Noch nicht geschriebene Reservierungen
+    halten den Stand zurück, sonst könnte ein Client sie mit `since` überspringen. Reservierungen eines
+    abgestürzten Requests werden nach SEQ_PENDING_TIMEOUT Sekunden ignoriert.
+    """
+    seq = collection_info.get("seq", 0)
+    oldest_valid = datetime.now(timezone.utc) - timedelta(seconds=SEQ_PENDING_TIMEOUT)
+
+    pending = [
+        entry["seq"] for entry in collection_info.get("pending_seq", [])
+        if entry["at"].replace(tzinfo=timezone.utc) >= oldest_valid
+    ]
+    return min(pending) - 1 if pending else seq
+
+def get_item_update(updates: Dict, seq: int) -> Dict:
+    # $max: ein langsameres Update mit kleinerer Nummer setzt seq nicht zurück, das Item bleibt für `since` sichtbar
+    return {"$set": {key: value for key, value in updates.items() if key not in ("_id", "seq")}, "$max": {"seq": seq}}
+
+def create_item_event(event: str, item: Dict, seq: int | None = None) -> Dict:
+    item_event = {
+        "event": event,
+        "item": item,
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    }
+
+    if seq is not None:
+        item_event["seq"] = seq
+
+    return item_event
+
+async def add_item_event(collection_id: str, event: str, item: Dict, seq: int | None = None):
     # get collection events
-    collection_events: Collection = await get_collection_by_id(f"{collection_id}_events")
+    collection_events = await get_events_collection(collection_id)
     # Insert the item into the collection
-    await collection_events.insert_one(
-        {
-            "event": event,
-            "item": item,
-            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-        }
-    )
-    logger.debug(f"item event added to {collection_id}")
\ No newline at end of file
+    await collection_events.insert_one(create_item_event(event, item, seq))
+    logger.debug(f"item event added to {collection_id}")
+
+async def add_item_events(collection_id: str, events: List[Dict], session=None):
+    if not events:
+        return
+
+    # get collection events
+    collection_events = await get_events_collection(collection_id)
+    # Insert all events with one round-trip
+    await collection_events.insert_many(events, ordered=True, session=session)
+    logger.debug(f"{len(events)} item events added to {collection_id}")
\ No newline at end of file
@@ -0,0 +1,148 @@
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from pymongo import ASCENDING
+
+from ..database_manager import get_db, get_redis
+
+INDEX_ADVISOR_THRESHOLD = int(os.getenv("INDEX_ADVISOR_THRESHOLD", "100"))
+INDEX_ADVISOR_UNUSED_DAYS = int(os.getenv("INDEX_ADVISOR_UNUSED_DAYS", "7"))
+INDEX_ADVISOR_MAX_FIELDS = int(os.getenv("INDEX_ADVISOR_MAX_FIELDS", "4"))
+
+# nur Indizes mit diesem Präfix werden vom Advisor wieder gelöscht
+INDEX_NAME_PREFIX = "advisor_"
+COLLECTIONS_KEY = "index_advisor:collections"
+
+EQUALITY_OPERATORS = {"$eq", "$in"}
+
+IndexShape = Tuple[Tuple[str, int], ...]
+
+def get_usage_key(collection_name: str) -> str:
+    return f"index_advisor:usage:{collection_name}"
+
+def get_last_used_key(collection_name: str) -> str:
+    return f"index_advisor:last_used:{collection_name}"
+
+
+def build_index_shape(mongo_filter: Dict, sort: Dict) -> IndexShape:
+    """
+    Index-Schlüssel für eine Abfrage nach der ESR-Regel: erst Gleichheits-Felder,
+    dann Sortier-Felder und zuletzt Bereichs-Felder (z. B. price>2).
+    """
+    equality, ranges = [], []
+    for field, condition in mongo_filter.items():
+        if field.startswith("$") or field == "_id":
+            continue
+
+        if isinstance(condition, dict) and not set(condition) <= EQUALITY_OPERATORS:
+            ranges.append(field)
+        else:
+            equality.append(field)
+
+    shape = [(field, ASCENDING) for field in equality]
+    shape += [(field, direction) for field, direction in sort.items() if field != "_id" and field not in equality]
+    shape += [(field, ASCENDING) for field in ranges if field not in sort]
+
+    return tuple(shape[:INDEX_ADVISOR_MAX_FIELDS])
+
+def encode_shape(shape: IndexShape) -> str:
+    return ",".join(f"{field}:{direction}" for field, direction in shape)
+
+def is_valid_shape(shape: IndexShape) -> bool:
+    return all(type(direction) is int and direction in (1, -1) for _, direction in shape)
+
+def decode_shape(encoded_shape: str) -> IndexShape:
+    return tuple((field, int(direction)) for field, direction in (part.rsplit(":", 1) for part in encoded_shape.split(",")))
+
+def get_index_name(shape: IndexShape) -> str:
+    return INDEX_NAME_PREFIX + "_".join(f"{field}_{direction}" for field, direction in shape)
+
+
+def normalize_index_key(key: List) -> IndexShape:
+    # Richtungen kommen je nach Server als int oder float, Spezial-Indizes haben Strings wie "text"
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in key)
+
+def is_covered(shape: IndexShape, index_keys: List[IndexShape]) -> bool:
+    """Ein Index deckt die Abfrage ab, wenn die Abfrage ein Präfix des Index ist (auch in umgekehrter Richtung)."""
+    reversed_shape = tuple((field, -direction) for field, direction in shape)
+    return any(keys[:len(shape)] in (shape, reversed_shape) for keys in index_keys)
+
+
+async def record_query_shape(collection_name: str, mongo_filter: Dict, sort: Optional[Dict] = None):
+    shape = build_index_shape(mongo_filter, sort or {})
+    if not shape or not is_valid_shape(shape):
+        return
+
+    encoded_shape = encode_shape(shape)
+    async with get_redis().pipeline(transaction=False) as pipe:
+        pipe.hincrby(get_usage_key(collection_name), encoded_shape, 1)
+        pipe.hset(get_last_used_key(collection_name), encoded_shape, int(time.time()))
+        pipe.sadd(COLLECTIONS_KEY, collection_name)
+        await pipe.execute()
+
+
+async def get_recorded_collections() -> List[str]:
+    return sorted(await get_redis().smembers(COLLECTIONS_KEY))
+
+
+async def get_index_recommendations(collection_names: Optional[List[str]] = None, threshold: int = INDEX_ADVISOR_THRESHOLD) -> List[Dict]:
+    """
+    - create: häufig genutzte Abfrage ohne passenden Index
+    - drop: vom Advisor angelegter Index, dessen Abfrage seit INDEX_ADVISOR_UNUSED_DAYS nicht mehr genutzt wurde
+    """
+    db = get_db()
+    redis = get_redis()
+
+    if collection_names is None:
+        collection_names = await get_recorded_collections()
+
+    unused_before = time.time() - INDEX_ADVISOR_UNUSED_DAYS * 24 * 60 * 60
+    recommendations = []
+
+    for collection_name in collection_names:
+        usage = await redis.hgetall(get_usage_key(collection_name))
+        last_used = await redis.hgetall(get_last_used_key(collection_name))
+        indexes = await db[collection_name].index_information()
+        index_keys = {index_name: normalize_index_key(index["key"]) for index_name, index in indexes.items()}
+
+        for encoded_shape, count in sorted(usage.items(), key=lambda entry: -int(entry[1])):
+            try:
+                shape = decode_shape(encoded_shape)
+            except ValueError:
+                # vor der Prüfung der Sortierrichtung gespeichert (z. B. "price:foo")
+                continue
+
+            if int(count) >= threshold and not is_covered(shape, list(index_keys.values())):
+                recommendations.append({
+                    "collection": collection_name,
+                    "action": "create",
+                    "name": get_index_name(shape),
+                    "keys": list(shape),
+                    "count": int(count)
+                })
+
+        for index_name, keys in index_keys.items():
+            if not index_name.startswith(INDEX_NAME_PREFIX):
+                continue
+
+            shape_last_used = last_used.get(encode_shape(keys))
+            if shape_last_used is None or int(shape_last_used) < unused_before:
+                recommendations.append({
+                    "collection": collection_name,
+                    "action": "drop",
+                    "name": index_name,
+                    "keys": list(keys),
+                    "last_used": int(shape_last_used) if shape_last_used else None
+                })
+
+    return recommendations
+
+
+async def reset_query_shapes(collection_name: str, remove: bool = False):
+    """Zähler zurücksetzen, damit der Schwellwert pro Lauf des Advisors gilt (last_used bleibt erhalten)."""
+    async with get_redis().pipeline(transaction=False) as pipe:
+        pipe.delete(get_usage_key(collection_name))
+        if remove:
+            pipe.delete(get_last_used_key(collection_name))
+            pipe.srem(COLLECTIONS_KEY, collection_name)
+        await pipe.execute()
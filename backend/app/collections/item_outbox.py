@@ -0,0 +1,104 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from ..logger_manager import LoggerManager
+from ..database_manager import get_db
+from ..metrics import item_write_stage_duration
+from ..tracing import get_trace_fields
+from .helper_methods import add_item_events, set_last_modified, invalidate_collection_cache, next_sequence_number, \
+    release_sequence_numbers
+
+OUTBOX_COLLECTION = "outbox"
+# "1": Item, Events und Outbox-Eintrag in einer Transaktion, MongoDB muss als Replica Set laufen (compose.yml).
+# "0": ohne Transaktion, nur für Tests und Benchmarks gegen ein einzelnes mongod
+OUTBOX_TRANSACTIONS = os.getenv("OUTBOX_TRANSACTIONS", "1")
+
+# Logging
+logger_instance = LoggerManager()
+logger = logger_instance.get_logger("Collections")
+
+# Änderung mit (Session, erste reservierte Sequenznummer) schreiben und (Events, WebSocket-Nachricht) zurückgeben
+ItemWrite = Callable[[object, int], Awaitable[Tuple[List[Dict], Dict]]]
+
+
+def use_transactions() -> bool:
+    return OUTBOX_TRANSACTIONS != "0"
+
+
+async def check_transactions():
+    """Beim Start prüfen, dass MongoDB Transaktionen kann, statt Item, Events und Outbox still getrennt zu schreiben."""
+    if not use_transactions():
+        logger.warning("item writes without transactions (OUTBOX_TRANSACTIONS=0), item, events and outbox can diverge")
+        return
+
+    hello = await get_db().command("hello")
+    if "setName" not in hello and hello.get("msg") != "isdbgrid":
+        raise RuntimeError(
+            "MongoDB does not support transactions, start it as replica set (see compose.yml) "
+            "or set OUTBOX_TRANSACTIONS=0"
+        )
+
+
+def create_outbox_entry(collection_id: str, user_id: str, message: Dict, seq: int) -> Dict:
+    return {
+        "channel": collection_id,
+        # Reihenfolge pro Liste, der Publisher sendet nach (channel, seq)
+        "seq": seq,
+        "sender": user_id,
+        "data": json.dumps(message),
+        "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        # im Request erzeugt, damit die gemessene Latenz auch die Wartezeit in der Outbox enthält
+        "trace": get_trace_fields()
+    }
+
+
+async def commit_item_change(collection_id: str, user_id: str, write: ItemWrite, seq_count: int = 1, shared: bool = False) -> Dict:
+    """
+    Reserviert `seq_count` Sequenznummern und schreibt die Änderung (`write`), ihre Events, das Änderungsdatum
+    und die WebSocket-Nachricht als Outbox-Eintrag in einer Transaktion. Die Nachricht wird danach vom
+    Outbox Publisher (plugins/outbox_publisher_service.py) an Redis gesendet, nicht im Request.
+    Die Reservierung wird erst freigegeben, wenn die Änderung geschrieben ist (siehe `get_committed_seq`).
+    `shared`: ob `write` in die gemeinsamen Collections schreibt (`ScopedCollection.is_scoped`).
+    """
+    reserved_seqs = []
+
+    async def run(session) -> Dict:
+        first_seq = await next_sequence_number(collection_id, seq_count, session=session, shared=shared)
+        reserved_seqs.append(first_seq)
+
+        with item_write_stage_duration.labels(stage="write").time():
+            events, message = await write(session, first_seq)
+
+        steps = [
+            lambda: add_item_events(collection_id, events, session=session),
+            lambda: set_last_modified(collection_id, session=session),
+            lambda: get_db()[OUTBOX_COLLECTION].insert_one(create_outbox_entry(collection_id, user_id, message, first_seq), session=session),
+        ]
+
+        with item_write_stage_duration.labels(stage="event").time():
+            if session is None:
+                await asyncio.gather(*(step() for step in steps))
+            else:
+                # Operationen einer Session dürfen nicht parallel laufen
+                for step in steps:
+                    await step()
+
+        return message
+
+    try:
+        if use_transactions():
+            async with await get_db().client.start_session() as session:
+                message = await session.with_transaction(run)
+        else:
+            message = await run(None)
+    finally:
+        # auch bei Fehlern, sonst hält die Reservierung den Sync-Stand bis zum Timeout zurück
+        await release_sequence_numbers(collection_id, reserved_seqs)
+
+    # Cache sofort invalidieren, damit der Client seine eigene Änderung direkt wieder lesen kann
+    with item_write_stage_duration.labels(stage="invalidation").time():
+        await invalidate_collection_cache(collection_id)
+    return message
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, model_validator
+from typing import Dict, Literal, Optional
+
+class BulkOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[str] = None
+    item: Optional[Dict] = None
+
+    @model_validator(mode="after")
+    def check_fields_of_operation(self):
+        # ohne id würde ObjectId(None) eine neue, zufällige id erzeugen
+        if self.op in ("update", "delete") and self.id is None:
+            raise ValueError(f"'{self.op}' needs an id")
+        if self.op in ("create", "update") and self.item is None:
+            raise ValueError(f"'{self.op}' needs an item")
+        return self
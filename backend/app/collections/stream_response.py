@@ -0,0 +1,32 @@
+import os
+from typing import AsyncIterator, Callable, Dict
+import orjson
+from fastapi.responses import StreamingResponse
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class NDJSONResponse(StreamingResponse):
+    media_type = "application/x-ndjson"
+
+
+async def stream_ndjson(header: Dict, cursor, convert: Callable[[Dict], Dict]) -> AsyncIterator[bytes]:
+    """
+    Erste Zeile: `header` (z. B. source und name), danach ein Dokument pro Zeile.
+    Die Dokumente werden direkt aus dem Cursor gelesen und in Blöcken von ca. 64 KB gesendet,
+    dadurch bleibt der Speicherbedarf unabhängig von der Größe der Collection.
+    """
+    yield orjson.dumps(header) + b"\n"
+
+    chunk = bytearray()
+    async for document in cursor:
+        chunk += orjson.dumps(convert(document))
+        chunk += b"\n"
+
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+
+    if chunk:
+        yield bytes(chunk)
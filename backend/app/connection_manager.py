@@ -1,6 +1,7 @@
 from __future__ import annotations
 import asyncio
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional, Tuple
 from fastapi import WebSocket, WebSocketDisconnect
 from redis.asyncio.client import PubSub
 
@@ -8,6 +9,9 @@ from .logger_manager import LoggerManager
 from .database_manager import DatabaseManager
 from .redis_stream_manager import RedisStreamManager
 from .task_manager import TaskManager
+from .websocket_connection import WebsocketConnection
+from .metrics import websocket_active_connections, stream_fanout_size, item_delivery_latency
+from .tracing import get_produced_at, start_span
 
 
 class ConnectionManager:
@@ -21,15 +25,26 @@ class ConnectionManager:
     async def init(self, database_manager: DatabaseManager):
         logger_instance = LoggerManager()
         self.logger = logger_instance.get_logger("Connection Manager")
-        self.active_connections: Dict[str, WebSocket] = {}
+        self.active_connections: Dict[str, WebsocketConnection] = {}
         self.channels: Dict[str, List[str]] = {}
         self.subscription_ready: Dict[str, asyncio.Event] = {}
-        self.subscriber_tasks: Dict[str, asyncio.Task] = {}
+        # Anlegen (connect) und Entfernen (unsubscribe) des Listeners einer Collection laufen nacheinander
+        self.channel_locks: Dict[str, asyncio.Lock] = {}
         self.taskManager = TaskManager()
 
         self.database_manager = database_manager
         self.redis_stream_manager = RedisStreamManager(database_manager.redis_client)
 
+        # Ein XREADGROUP Loop pro Worker für alle Collections
+        group = self.redis_stream_manager.get_worker_group()
+        self.dispatcher_task = self.taskManager.create_task(
+                self.redis_stream_manager.listen_to_streams(
+                    group=group,
+                    consumer=group,
+                    on_messages=self.handle_stream_messages,
+                )
+            )
+
 
     # ------------------- connection -------------------
 
@@ -38,26 +53,43 @@ class ConnectionManager:
 
         connection_id = f"{channel_name}_{user_id}"
 
-        self.active_connections[connection_id] = websocket
-        self.logger.debug(f"[Connection Manager] connect websocket for user {user_id}")
+        previous_connection = self.active_connections.get(connection_id)
+        if previous_connection:
+            previous_connection.stop()
+
+        self.active_connections[connection_id] = WebsocketConnection(websocket, user_id, channel_name)
+        websocket_active_connections.set(len(self.active_connections))
+        self.logger.debug("[Connection Manager] connect websocket for user %s", user_id)
 
-        channels = await self.redis_stream_manager.get_channels_of_user(user_id)
+        if channel_name not in self.channels:
+            self.channels[channel_name] = []
 
-        for channel_name in channels:
-            if channel_name not in self.channels:
-                self.channels[channel_name] = []
+        if not user_id in self.channels[channel_name]:
+            self.logger.debug("websocket subscribe to %s", channel_name)
+            self.channels[channel_name].append(user_id)
 
-            if not user_id in self.channels[channel_name]:
-                self.logger.debug(f"websocket subscribe to {channel_name}")
-                self.channels[channel_name].append(user_id)
-                await self.create_redis_stream_listener(user_id, channel_name)
+        # Pro Worker nur ein Listener je Collection
+        async with self.get_channel_lock(channel_name):
+            if channel_name not in self.subscription_ready:
+                ready = self.subscription_ready[channel_name] = asyncio.Event()
+                try:
+                    await self.create_redis_stream_listener(channel_name)
+                except Exception:
+                    # wartende Verbindungen nicht für immer blockieren, der nächste connect versucht es erneut
+                    self.subscription_ready.pop(channel_name, None)
+                    ready.set()
+                    raise
+                ready.set()
+
+        await self.subscription_ready[channel_name].wait()
 
     def disconnect(self, websocket: WebSocket):
-        connection_id = next((uid for uid, conn in self.active_connections.items() if conn == websocket), None)
+        connection_id = next((uid for uid, conn in self.active_connections.items() if conn.websocket == websocket), None)
 
-        self.logger.debug(f"[Connection Manager] disconnect websocket from user {connection_id}")
+        self.logger.debug("[Connection Manager] disconnect websocket from user %s", connection_id)
         if connection_id:
-            del self.active_connections[connection_id]
+            self.active_connections.pop(connection_id).stop()
+            websocket_active_connections.set(len(self.active_connections))
 
 
     # ------------------- channel management -------------------
@@ -69,12 +101,12 @@ class ConnectionManager:
         self.taskManager.create_task(self.redis_stream_manager.remove_user_from_channel(channel_name, user_id))
 
         if channel_name in self.channels and user_id in self.channels[channel_name]:
-            self.logger.debug(f"websocket unsubscribe user {user_id} from channel {channel_name}")
+            self.logger.debug("websocket unsubscribe user %s from channel %s", user_id, channel_name)
             self.channels[channel_name].remove(user_id)
 
-            self.logger.debug(f"[REDIS GROUP] channel user count {len(self.channels[channel_name])}")
+            self.logger.debug("[REDIS GROUP] channel user count %s", len(self.channels[channel_name]))
             if len(self.channels[channel_name]) == 0:
-                self.logger.debug(f"websocket redis remove group {channel_name}")
+                self.logger.debug("websocket redis remove group %s", channel_name)
                 self.taskManager.create_task(self.unsubscribe(channel_name))
 
     def remove_all_users_from_channel(self, channel_name: str):
@@ -90,60 +122,68 @@ class ConnectionManager:
 
     # ------------------- send -------------------
 
-    async def send_to_user(self, connection_id: str, message: str) -> bool:
-        websocket = self.active_connections.get(connection_id)
-        if websocket:
-            self.logger.debug(f"websocket message sent to user {connection_id}")
-            await websocket.send_text(message)
-            return True
+    async def send_to_user(self, connection_id: str, message: str, trace_fields: Optional[Dict] = None) -> bool:
+        # nur einreihen, gesendet wird vom Writer Task der Verbindung
+        connection = self.active_connections.get(connection_id)
+        if connection:
+            self.logger.debug("websocket message queued for user %s", connection_id)
+            return connection.send(message, trace_fields)
         else:
-            self.logger.warning(f"user {connection_id} is not connected. wrong socket manager.")
+            self.logger.warning("user %s is not connected. wrong socket manager.", connection_id)
             return False
 
     async def send_to_broadcast(self, user_id: str, message: str):
         for connection in self.active_connections.values():
-            if connection.user == user_id:
+            if connection.user_id == user_id:
                 continue
 
-            await connection.send_text(message)
+            connection.send(message)
+
+    def get_connection_lags(self) -> Dict[str, Dict]:
+        return {
+            connection_id: {
+                "queued": len(connection.queue),
+                "last_lag": connection.last_lag,
+                "max_lag": connection.max_lag,
+                "sent": connection.sent_messages,
+                "dropped": connection.dropped_messages,
+            }
+            for connection_id, connection in self.active_connections.items()
+        }
 
     async def send_to_channel(self, user_id: str, channel_name: str, message):
-        redis_channel_user_ids = await self.redis_stream_manager.get_users_in_channel(channel_name)
-
-        self.logger.debug(f"Websocket Manager: redis_channel_user_ids:       {redis_channel_user_ids}")
-        self.logger.debug(f"Websocket Manager: redis_channel_user_ids count: {len(redis_channel_user_ids)}")
-
-        if len(redis_channel_user_ids) == 0:
-            self.logger.info(f"Websocket Manager: no one in redis stream channel. skip message...")
-            return
-
-        for redis_channel_user_id in redis_channel_user_ids:
-            self.logger.info(f"Websocket Manager: send message to redis stream channel {channel_name}")
-            await self.redis_stream_manager.add_message(
-                    stream_key=f"{channel_name}_{redis_channel_user_id}",
-                    group_name=channel_name,
-                    user_id=user_id,
-                    data=message
-                )
+        # Eine Nachricht pro Collection, unabhängig von der Anzahl der Mitglieder
+        self.logger.info("Websocket Manager: send message to redis stream channel %s", channel_name)
+        await self.redis_stream_manager.add_message(
+                stream_key=self.redis_stream_manager.get_stream_key(channel_name),
+                group_name=channel_name,
+                user_id=user_id,
+                data=message
+            )
 
 
     # ------------------- redis stream -------------------
 
-    async def create_redis_stream_listener(self, user_id, channel_name):
-        key = f"{channel_name}_{user_id}"
+    async def create_redis_stream_listener(self, channel_name):
+        stream_key = self.redis_stream_manager.get_stream_key(channel_name)
+        group = self.redis_stream_manager.get_worker_group()
 
         self.logger.debug("websocket create listener called")
 
-        task = self.taskManager.create_task(
-                self.redis_stream_manager.listen_to_stream(
-                    stream_key=key,
-                    group=channel_name,
-                    consumer=f"consumer_{user_id}",
-                    on_message=self.handle_stream_message,
-                )
-            )
+        # Gruppe vor dem Start anlegen, damit keine Nachricht direkt nach dem Verbinden verloren geht
+        await self.redis_stream_manager.create_group(stream_key, group)
+        self.redis_stream_manager.add_stream(stream_key)
+
+    async def handle_stream_messages(self, messages: List[Tuple[str, str, Dict]]):
+        # erst den ganzen Batch ausliefern, dann mit einem Round-Trip bestätigen
+        msg_ids_of_streams: Dict[str, List[str]] = {}
+
+        for stream_key, msg_id, msg_data in messages:
+            await self.handle_stream_message(msg_id, msg_data)
+            msg_ids_of_streams.setdefault(stream_key, []).append(msg_id)
 
-        self.subscriber_tasks[channel_name] = task
+        self.logger.info("Websocket: %s messages in redis acknowledged", len(messages))
+        await self.redis_stream_manager.ack_messages(msg_ids_of_streams, self.redis_stream_manager.get_worker_group())
 
     async def handle_stream_message(self, msg_id: str, msg_data: Dict):
         try:
@@ -152,48 +192,52 @@ class ConnectionManager:
             data = msg_data.get("data")
 
             if channel and sender and data:
-                self.logger.debug(f"received stream message from user {sender} for channel {channel}")
-                await self.send_to_websocket_channel(sender, channel, data, msg_id)
+                self.logger.debug("received stream message %s from user %s for channel %s", msg_data.get("trace_id"), sender, channel)
+
+                produced_at = get_produced_at(msg_data)
+                if produced_at is not None:
+                    item_delivery_latency.labels(stage="stream").observe(max(0.0, time.time() - produced_at))
+
+                with start_span("stream delivery", msg_data, channel=channel, msg_id=msg_id):
+                    await self.send_to_websocket_channel(sender, channel, data, msg_id, msg_data)
 
         except Exception as e:
-                self.logger.error(f"Error in handle_stream_message: {e}")
-                await asyncio.sleep(0.3)
+                self.logger.error("Error in handle_stream_message: %s", e)
 
-    async def send_to_websocket_channel(self, user_id: str, channel_name: str, message: str, msg_id: str):
+    async def send_to_websocket_channel(self, user_id: str, channel_name: str, message: str, msg_id: str, trace_fields: Optional[Dict] = None):
         self.logger.info(f"Websocket: send message to users")
         message_sent = []
 
-        channel_user_ids = self.channels.get(channel_name, [])
-        redis_channel_user_ids = await self.redis_stream_manager.get_users_in_channel(channel_name)
-        self.logger.debug(f"Websocket: channel_user_ids:       {channel_user_ids}")
-        self.logger.debug(f"Websocket: redis_channel_user_ids: {redis_channel_user_ids}")
-        self.logger.debug(f"Websocket: BEFORE SEND TO USER | message_sent: {message_sent}")
+        channel_user_ids = list(self.channels.get(channel_name, []))
+        self.logger.debug("Websocket: channel_user_ids:       %s", channel_user_ids)
+        self.logger.debug("Websocket: BEFORE SEND TO USER | message_sent: %s", message_sent)
 
         for channel_user_id in channel_user_ids:
             if channel_user_id != user_id:
                 connection_id = f"{channel_name}_{channel_user_id}"
-                temp = await self.send_to_user(connection_id, message)
+                temp = await self.send_to_user(connection_id, message, trace_fields)
 
-                if temp:
-                    self.logger.info(f"Websocket: message in redis acknowledged")
-                    await self.redis_stream_manager.ack_message(f"{channel_name}_{channel_user_id}", channel_name, msg_id)
-                    await self.redis_stream_manager.delete_message(f"{channel_name}_{channel_user_id}", msg_id)
-                else:
+                if not temp:
                     self.remove_user_from_channel(channel_user_id, channel_name)
 
                 message_sent.append(temp)
 
-        self.logger.debug(f"Websocket: AFTER SEND TO USER | message_sent: {message_sent}")
+        self.logger.debug("Websocket: AFTER SEND TO USER | message_sent: %s", message_sent)
+        stream_fanout_size.observe(len(message_sent))
+
+    def get_channel_lock(self, channel_name: str) -> asyncio.Lock:
+        return self.channel_locks.setdefault(channel_name, asyncio.Lock())
 
     async def unsubscribe(self, channel_name: str):
-        task = self.subscriber_tasks.get(channel_name)
-        if task:
-            self.logger.debug(f"cancelling subscription task {channel_name}")
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                self.logger.debug(f"subscription task {channel_name} cancelled")
-            del self.subscriber_tasks[channel_name]
-
-            await self.redis_stream_manager.delete_group(channel_name, "websocket_group")
+        # sonst könnte ein neuer connect die Gruppe anlegen, bevor das delete_group unten sie wieder löscht
+        async with self.get_channel_lock(channel_name):
+            # in der Zwischenzeit wieder verbunden
+            if self.channels.get(channel_name):
+                return
+
+            if self.subscription_ready.pop(channel_name, None):
+                self.logger.debug("remove stream of channel %s from dispatcher", channel_name)
+                stream_key = self.redis_stream_manager.get_stream_key(channel_name)
+                self.redis_stream_manager.remove_stream(stream_key)
+
+                await self.redis_stream_manager.delete_group(stream_key, self.redis_stream_manager.get_worker_group())
@@ -8,6 +8,7 @@ from .logger_manager import LoggerManager
 class DatabaseManager:
     db: Database
     redis_client: Redis
+    redis_bytes_client: Redis
     mongo_client: AsyncIOMotorClient
 
     _instance = None
@@ -33,16 +34,25 @@ class DatabaseManager:
             self.logger.info("Connect to Database...")
             # Umgebungsvariablen abrufen
             self.redis_host = os.getenv("REDIS_HOST", "localhost")
+            self.redis_port = int(os.getenv("REDIS_PORT", "6379"))
             self.mongo_uri = os.getenv("MONGO_URI", "MONGO_URI")
             self.mongo_db = os.getenv("MONGO_DATABASE", "my_database")
 
             self.redis_client = Redis(
                 host=self.redis_host,
-                port=6379,
+                port=self.redis_port,
                 decode_responses=True,
                 max_connections=self.max_connections,
             )
 
+            # ohne Dekodierung: gecachte JSON Antworten werden als Bytes gelesen und direkt ausgeliefert
+            self.redis_bytes_client = Redis(
+                host=self.redis_host,
+                port=self.redis_port,
+                decode_responses=False,
+                max_connections=self.max_connections,
+            )
+
             self.mongo_client = AsyncIOMotorClient(
                 self.mongo_uri,
                 maxPoolSize=self.max_connections,
@@ -56,6 +66,7 @@ class DatabaseManager:
         self.logger.info("Closing DB connections...")
         self.mongo_client.close()
         await self.redis_client.close()
+        await self.redis_bytes_client.close()
 
 databaseManager = DatabaseManager()
 
@@ -63,4 +74,7 @@ def get_db() -> Database:
     return databaseManager.db
 
 def get_redis() -> Redis:
-    return databaseManager.redis_client
\ No newline at end of file
+    return databaseManager.redis_client
+
+def get_redis_bytes() -> Redis:
+    return databaseManager.redis_bytes_client
@@ -1,12 +1,140 @@
+import base64
+import json
 import logging
 import logging.handlers
-import logging_loki
 import queue
 import os
-import multiprocessing
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import log_records_dropped
 
 DEBUG = os.getenv("DEBUG", "0")
 
+# Standard-Level für alle Logger, einzelne Logger über LOG_LEVELS, z. B. "Redis Stream Manager=DEBUG,Collections=WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG == "1" else "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+LOKI_URL = os.getenv("LOKI_URL", "http://loki:3100/loki/api/v1/push")
+# Basic Auth für Loki, leerer Benutzername -> ohne Auth
+LOKI_USERNAME = os.getenv("LOKI_USERNAME", "username")
+LOKI_PASSWORD = os.getenv("LOKI_PASSWORD", "password")
+
+
+def parse_log_levels(log_levels: str) -> Dict[str, str]:
+    levels = {}
+    for part in log_levels.split(","):
+        if "=" in part:
+            name, level = part.rsplit("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Verwirft Records, wenn die Queue voll ist, statt den Event Loop zu blockieren oder Fehler auszugeben."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            log_records_dropped.labels(reason="queue_full").inc()
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """Schreibt die Handler spätestens alle LOG_FLUSH_INTERVAL Sekunden im Listener-Thread weg."""
+
+    _empty = object()
+
+    def __init__(self, log_queue: queue.Queue, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.last_flush = time.monotonic()
+
+    def dequeue(self, block: bool):
+        while True:
+            timeout = max(0.0, self.last_flush + LOG_FLUSH_INTERVAL - time.monotonic())
+            try:
+                record = self.queue.get(block, timeout=timeout)
+            except queue.Empty:
+                record = self._empty
+
+            if time.monotonic() - self.last_flush >= LOG_FLUSH_INTERVAL:
+                self.flush()
+
+            if record is not self._empty:
+                return record
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        for handler in self.handlers:
+            handler.flush()
+
+    def enqueue_sentinel(self):
+        # beim Beenden auf Platz in der Queue warten, statt an einer vollen Queue zu scheitern
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        super().stop()
+        self.flush()
+
+
+class LokiBatchHandler(logging.Handler):
+    """Sendet gesammelte Records mit einem HTTP-Request an Loki (nur im Listener-Thread verwendet)."""
+
+    def __init__(self, url: str, tags: Dict[str, str], auth: Optional[Tuple[str, str]] = None, capacity: int = LOG_BATCH_SIZE):
+        super().__init__()
+        self.url = url
+        self.tags = tags
+        self.headers = {"Content-Type": "application/json"}
+        if auth:
+            credentials = base64.b64encode(f"{auth[0]}:{auth[1]}".encode("utf-8")).decode("ascii")
+            self.headers["Authorization"] = f"Basic {credentials}"
+        self.capacity = capacity
+        self.buffer: List[Tuple[Tuple[str, str], str, str]] = []
+
+    def emit(self, record: logging.LogRecord):
+        labels = (record.levelname.lower(), record.name)
+        self.buffer.append((labels, str(int(record.created * 1e9)), self.format(record)))
+
+        if len(self.buffer) >= self.capacity:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+
+        buffer, self.buffer = self.buffer, []
+
+        streams: Dict[Tuple[str, str], List[List[str]]] = {}
+        for labels, timestamp, line in buffer:
+            streams.setdefault(labels, []).append([timestamp, line])
+
+        payload = {"streams": [
+            {"stream": self.tags | {"severity": severity, "logger": logger_name}, "values": values}
+            for (severity, logger_name), values in streams.items()
+        ]}
+
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers=self.headers,
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5):
+                pass
+        except Exception:
+            # Loki nicht erreichbar: Batch verwerfen, die Logs stehen weiterhin in der Datei
+            log_records_dropped.labels(reason="loki").inc(len(buffer))
+
+
 class LoggerManager:
     _instance = None
     _initialized = False
@@ -21,9 +149,11 @@ class LoggerManager:
             return
         LoggerManager._initialized = True
 
-        self.log_queue = queue.Queue(200)
+        self.log_levels = parse_log_levels(LOG_LEVELS)
 
-        self.queue_handler = logging.handlers.QueueHandler(self.log_queue)
+        self.log_queue = queue.Queue(LOG_QUEUE_SIZE)
+
+        self.queue_handler = DroppingQueueHandler(self.log_queue)
 
         self.log_format = '%(asctime)s - %(name)-30s - WORKER %(process)-3s - %(module)-35s - %(levelname)-7s - %(message)s'
         formatter = logging.Formatter(self.log_format)
@@ -37,25 +167,28 @@ class LoggerManager:
         )
         self.file_handler.setFormatter(formatter)
 
-        self.listener = logging.handlers.QueueListener(
-            self.log_queue, self.file_handler
-        )
-        self.listener.start()
-
-        self.handlers = [self.queue_handler]
+        # Datei und Loki werden nur aus dem Listener-Thread und in Batches geschrieben
+        listener_handlers = [
+            logging.handlers.MemoryHandler(LOG_BATCH_SIZE, flushLevel=logging.ERROR, target=self.file_handler)
+        ]
 
         if DEBUG == "1":
-            loki_handler = logging_loki.LokiHandler(
-                url="http://loki:3100/loki/api/v1/push",
-                tags={"application": "einkaufsliste_backend", "worker": self.get_pid_of_process()},
-                auth=("username", "password"),
-                version="1",
+            loki_handler = LokiBatchHandler(
+                url=LOKI_URL,
+                tags={"application": "einkaufsliste_backend", "worker": str(self.get_pid_of_process())},
+                auth=(LOKI_USERNAME, LOKI_PASSWORD) if LOKI_USERNAME else None,
             )
-            self.handlers.append(loki_handler)
+            loki_handler.setFormatter(formatter)
+            listener_handlers.append(loki_handler)
+
+        self.listener = BatchingQueueListener(self.log_queue, *listener_handlers)
+        self.listener.start()
+
+        self.handlers = [self.queue_handler]
 
     def get_logger(self, name: str = "Einkaufsliste Backend"):
         logger = logging.getLogger(name)
-        logger.setLevel(logging.DEBUG)
+        logger.setLevel(self.log_levels.get(name, LOG_LEVEL))
 
         # Handler nur einmal hinzufügen
         for handler in self.handlers:
@@ -64,6 +197,9 @@ class LoggerManager:
 
         return logger
 
+    def get_dropped_records(self) -> int:
+        return self.queue_handler.dropped
+
     def stop_listener(self):
         self.listener.stop()
 
@@ -1,5 +1,5 @@
 import os
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from prometheus_fastapi_instrumentator import Instrumentator
 from contextlib import asynccontextmanager
 
@@ -9,11 +9,18 @@ from .routers import (
     collections_item_get_methods,
     collections_item_edit_methods,
     websockets,
-    authentication
+    authentication,
+    admin
 )
 from .service_loader import load_services
 from .logger_manager import LoggerManager
 from .connection_manager import ConnectionManager
+from .collections.collection_cache import CollectionCache
+from .collections.item_outbox import check_transactions
+from .authentication.user_cache import UserCache
+from .metrics import metrics_endpoint
+from .authentication.auth_methods import verify_admin_key
+from .tracing import init_tracing
 
 from multiprocessing import parent_process
 import logging
@@ -29,8 +36,11 @@ logger = logger_instance.get_logger()
 
 database_manager = DatabaseManager()
 connectionManager = ConnectionManager()
+collectionCache = CollectionCache()
+userCache = UserCache()
 
 DEBUG = os.getenv("DEBUG", "0")
+METRICS = os.getenv("METRICS", "1")
 
 def is_master_process() -> bool:
     """Funktion, um zu prüfen, ob wir im Master-Prozess sind"""
@@ -42,9 +52,14 @@ async def lifespan(app: FastAPI):
     
     if not master:
         await database_manager.init()
+        await check_transactions()
         await connectionManager.init(database_manager)
+        await collectionCache.init(database_manager.redis_client)
+        await userCache.init(database_manager.redis_client)
 
     yield
+    await userCache.shutdown()
+    await collectionCache.shutdown()
     await database_manager.shutdown()
 
 # FastAPI-Anwendung erstellen
@@ -56,10 +71,16 @@ instrumentator = Instrumentator(
         excluded_handlers=[".*admin.*", "/metrics"],
     )
 
-if DEBUG == "1":
-    # Prometheus metrics
+if METRICS == "1":
+    # Prometheus metrics (mit PROMETHEUS_MULTIPROC_DIR über alle Worker zusammengefasst)
     logger.info("Starting Prometheus metrics...")
-    instrumentator.instrument(app).expose(app)
+    instrumentator.instrument(app)
+    # nur mit Admin Key (Header admin-key), sonst wären Collection IDs und Lastdaten öffentlich
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False,
+                      dependencies=[Depends(verify_admin_key)])
+
+# OpenTelemetry (TRACING=1): Spans für HTTP Requests, MongoDB, Stream und Websocket
+init_tracing(app)
 
 app.debug = True if(DEBUG == "1") else False
 
@@ -68,6 +89,7 @@ app.include_router(collections_collection_methods.router)
 app.include_router(collections_item_get_methods.router)
 app.include_router(collections_item_edit_methods.router)
 app.include_router(websockets.router)
+app.include_router(admin.router)
 
 #-------------------------------------------------------------------------------------------------------------------
 
@@ -0,0 +1,89 @@
+import os
+from fastapi import Response
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, \
+    multiprocess
+
+# gesetzt (start-api.sh): alle uvicorn Worker und der service_loader schreiben ihre Werte in dieses Verzeichnis
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", os.getenv("prometheus_multiproc_dir"))
+
+
+def metrics_endpoint() -> Response:
+    """Metriken aller Prozesse zusammengefasst (Multiprocess-Modus) oder nur die dieses Prozesses."""
+    registry = REGISTRY
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=PROMETHEUS_MULTIPROC_DIR)
+
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+# ------------------- authentication -------------------
+
+password_hash_queue_depth = Gauge(
+    "password_hash_queue_depth",
+    "bcrypt hash/verify calls waiting for or running in the password thread pool",
+    multiprocess_mode="livesum",
+)
+
+# ------------------- websockets -------------------
+
+websocket_send_lag = Histogram(
+    "websocket_send_lag_seconds",
+    "time a message waits in the outbound queue of a websocket until it is sent",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+websocket_outbound_queue_depth = Gauge(
+    "websocket_outbound_queue_depth",
+    "messages waiting in the outbound queues of all websockets",
+    multiprocess_mode="livesum",
+)
+
+websocket_dropped_messages = Counter(
+    "websocket_dropped_messages_total",
+    "messages dropped because the outbound queue of a websocket was full",
+    ["policy"],
+)
+
+
+websocket_active_connections = Gauge(
+    "websocket_active_connections",
+    "open websocket connections per worker",
+    multiprocess_mode="liveall",
+)
+
+item_delivery_latency = Histogram(
+    "item_delivery_latency_seconds",
+    "time from the item write until the change is read from the stream (stream) or sent on a websocket (websocket)",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+stream_fanout_size = Histogram(
+    "stream_fanout_size",
+    "websocket connections of a worker a stream message is delivered to",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250),
+)
+
+# ------------------- collections -------------------
+
+collection_cache_requests = Counter(
+    "collection_cache_requests_total",
+    "requests by cache result (local, redis, miss)",
+    ["endpoint", "result"],
+)
+
+item_write_stage_duration = Histogram(
+    "item_write_stage_seconds",
+    "duration of the stages of an item write (write, event, invalidation, publish)",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+# ------------------- logging -------------------
+
+log_records_dropped = Counter(
+    "log_records_dropped_total",
+    "log records dropped because the log queue was full or Loki was not reachable",
+    ["reason"],
+)
@@ -0,0 +1,38 @@
+from datetime import time
+from pymongo.errors import OperationFailure
+from app.service_scheduled import ScheduledService
+from app.collections.index_advisor import get_index_recommendations, get_recorded_collections, reset_query_shapes
+
+class IndexAdvisorService(ScheduledService):
+    service_name = "Index Advisor Service"
+    run_time = time(hour=3, minute=30)
+
+    async def run_scheduled_task(self):
+        db = self.get_database()
+        self.logger.info(f"[{self.service_name}] Checking index recommendations...")
+
+        existing_collections = set(await db.list_collection_names())
+        recorded_collections = await get_recorded_collections()
+        recommendations = await get_index_recommendations(recorded_collections)
+
+        for recommendation in recommendations:
+            collection_name = recommendation["collection"]
+            if collection_name not in existing_collections:
+                continue
+
+            try:
+                if recommendation["action"] == "create":
+                    self.logger.info(f"[{self.service_name}] create index {recommendation['name']} on {collection_name} ({recommendation['count']} queries)")
+                    await db[collection_name].create_index(recommendation["keys"], name=recommendation["name"])
+                else:
+                    self.logger.info(f"[{self.service_name}] drop unused index {recommendation['name']} on {collection_name}")
+                    await db[collection_name].drop_index(recommendation["name"])
+            except OperationFailure as e:
+                self.logger.error(f"[{self.service_name}] index {recommendation['name']} on {collection_name} failed: {e}")
+
+        # Zähler pro Lauf zurücksetzen, Statistiken gelöschter Collections entfernen
+        for collection_name in recorded_collections:
+            await reset_query_shapes(collection_name, remove=collection_name not in existing_collections)
+
+        self.logger.info(f"[{self.service_name}] Index advisor complete.")
+
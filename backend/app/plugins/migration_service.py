@@ -1,9 +1,15 @@
 import asyncio
+import os
 from app.service_base import BaseService
+from app.collections.collection_storage import is_shared_storage, SHARED_ITEMS_COLLECTION, SHARED_EVENTS_COLLECTION, SCOPE_FIELD, \
+    STORAGE_MIGRATING, STORAGE_SHARED
+from app.collections.helper_methods import create_shared_collection_indexes
 from pymongo.database import Database
-from pymongo import ASCENDING, errors
+from pymongo import ASCENDING, InsertOne, errors
 from typing import Callable, List
 
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+
 class Migration:
     def __init__(self, name: str, function: Callable):
         self.name = name
@@ -31,9 +37,91 @@ class MigrationService(BaseService):
             Migration("add_users_in_collection_index", lambda: db.users_collections.create_index([("users", ASCENDING)])),
         ]
 
+        if is_shared_storage():
+            migrations += [
+                Migration("add_shared_collection_indexes", lambda: create_shared_collection_indexes()),
+                Migration("move_to_shared_collections_per_list", lambda: self.move_to_shared_collections(db)),
+            ]
+        else:
+            migrations += [
+                Migration("add_sequence_number_index", lambda: self.add_sequence_number_index(db)),
+            ]
+
         await self.apply_migrations(db, migrations)
         
         
+    async def add_sequence_number_index(self, db: Database):
+        async for collection_info in db.users_collections.find({}, {"id": 1}):
+            collection_id = collection_info["id"]
+            await db[collection_id].create_index([("seq", ASCENDING)])
+            await db[f"{collection_id}_events"].create_index([("seq", ASCENDING)])
+
+    async def move_to_shared_collections(self, db: Database):
+        """
+        Zieht die Listen einzeln in die gemeinsamen Collections um. Bis zum Umschalten (`storage: "shared"`) liest
+        und schreibt die API weiter in den eigenen Collections der Liste, nur während des Kopierens werden
+        Schreibzugriffe auf diese eine Liste mit 503 abgelehnt. Ein Abbruch kann einfach wiederholt werden.
+        """
+        existing_collections = set(await db.list_collection_names())
+
+        async for collection_info in db.users_collections.find({"storage": {"$ne": STORAGE_SHARED}}, {"id": 1}):
+            await self.move_collection_to_shared(db, collection_info["id"], existing_collections)
+
+    async def move_collection_to_shared(self, db: Database, collection_id: str, existing_collections: set):
+        # next_sequence_number ändert dasselbe Dokument in der Transaktion des Schreibzugriffs: das Update wartet
+        # auf laufende Schreibzugriffe, danach kommt keiner mehr in den alten Collections an
+        result = await db.users_collections.update_one({"id": collection_id}, {"$set": {"storage": STORAGE_MIGRATING}})
+        if result.matched_count == 0:
+            self.logger.info(f"[{self.service_name}] collection {collection_id} deleted, not moved")
+            return
+
+        sources = [(collection_id, SHARED_ITEMS_COLLECTION), (f"{collection_id}_events", SHARED_EVENTS_COLLECTION)]
+        try:
+            for source_name, target_name in sources:
+                if source_name in existing_collections:
+                    copied = await self.copy_documents(db[source_name], db[target_name], collection_id)
+                    self.logger.info(f"[{self.service_name}] copied {copied} documents from {source_name} to {target_name}")
+
+            result = await db.users_collections.update_one({"id": collection_id}, {"$set": {"storage": STORAGE_SHARED}})
+        except Exception:
+            # Schreibzugriffe wieder in den alten Collections zulassen, beim nächsten Start wird neu kopiert
+            await db.users_collections.update_one({"id": collection_id, "storage": STORAGE_MIGRATING}, {"$unset": {"storage": ""}})
+            if await db.users_collections.count_documents({"id": collection_id}, limit=1):
+                raise
+            result = None
+
+        if result is None or result.matched_count == 0:
+            # während des Kopierens gelöscht: keine verwaisten Dokumente zurücklassen
+            for _, target_name in sources:
+                await db[target_name].delete_many({SCOPE_FIELD: collection_id})
+            self.logger.info(f"[{self.service_name}] collection {collection_id} deleted while moving, copies removed")
+
+        for source_name, _ in sources:
+            if source_name in existing_collections:
+                await db.drop_collection(source_name)
+
+    async def copy_documents(self, source, target, collection_id: str) -> int:
+        # bis zum Umschalten schreibt nur die Migration in die gemeinsamen Collections: Reste eines
+        # abgebrochenen Versuchs löschen und neu einfügen, statt veraltete Kopien stehen zu lassen
+        await target.delete_many({SCOPE_FIELD: collection_id})
+
+        copied = 0
+        batch = []
+
+        async for document in source.find({}).sort("_id", ASCENDING).batch_size(MIGRATION_BATCH_SIZE):
+            batch.append(InsertOne(document | {SCOPE_FIELD: collection_id}))
+
+            if len(batch) >= MIGRATION_BATCH_SIZE:
+                await target.bulk_write(batch, ordered=False)
+                copied += len(batch)
+                batch = []
+
+        if batch:
+            await target.bulk_write(batch, ordered=False)
+            copied += len(batch)
+
+        return copied
+
     async def apply_migrations(self, db: Database, migrations: List[Migration]):
         for migration in migrations:
             try:
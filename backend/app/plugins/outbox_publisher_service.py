@@ -0,0 +1,91 @@
+import asyncio
+import os
+from pymongo import ASCENDING
+from app.service_base import BaseService
+from app.database_manager import get_redis
+from app.redis_stream_manager import RedisStreamManager
+from app.collections.item_outbox import OUTBOX_COLLECTION
+from app.collections.helper_methods import get_committed_seq
+from app.metrics import item_write_stage_duration
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.05"))
+
+class OutboxPublisherService(BaseService):
+    service_name = "Outbox Publisher Service"
+
+    async def run(self):
+        db = self.get_database()
+        outbox = db[OUTBOX_COLLECTION]
+        stream_manager = RedisStreamManager(get_redis())
+
+        await outbox.create_index([("channel", ASCENDING), ("seq", ASCENDING)])
+        self.logger.info(f"[{self.service_name}] publishing outbox messages...")
+
+        last_channel = ""
+        while True:
+            try:
+                # pro Liste nach Sequenznummer (die _id mehrerer Worker ist nicht nach Schreibzeit sortiert).
+                # Die Listen werden reihum gelesen, damit eine sehr aktive Liste die anderen nicht blockiert.
+                entries = await self.get_entries(outbox, last_channel)
+                if not entries and last_channel:
+                    last_channel = ""
+                    entries = await self.get_entries(outbox, last_channel)
+
+                if not entries:
+                    await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+                    continue
+
+                last_channel = entries[-1]["channel"]
+
+                entries = await self.get_committed_entries(db, outbox, entries)
+                if not entries:
+                    await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+                    continue
+
+                with item_write_stage_duration.labels(stage="publish").time():
+                    await stream_manager.add_messages([
+                        (stream_manager.get_stream_key(entry["channel"]), entry["channel"], entry["sender"], entry["data"], entry.get("trace"))
+                        for entry in entries
+                    ])
+
+                # erst nach dem Senden löschen (at-least-once)
+                await outbox.delete_many({"_id": {"$in": [entry["_id"] for entry in entries]}})
+                self.logger.debug(f"[{self.service_name}] {len(entries)} messages published")
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.logger.error(f"[{self.service_name}] Error while publishing outbox: {e}")
+                await asyncio.sleep(1)
+
+    async def get_entries(self, outbox, last_channel: str):
+        return await outbox.find({"channel": {"$gt": last_channel}}) \
+            .sort([("channel", ASCENDING), ("seq", ASCENDING)]) \
+            .limit(OUTBOX_BATCH_SIZE) \
+            .to_list(length=None)
+
+    async def get_committed_entries(self, db, outbox, entries):
+        """
+        Nur Einträge bis zur geschriebenen Sequenznummer ihrer Liste (`get_committed_seq`). Reservierungen werden
+        nicht in Reihenfolge committet, ein später committeter Eintrag mit kleinerer Nummer würde sonst nach einem
+        mit größerer Nummer gesendet.
+        """
+        channels = list({entry["channel"] for entry in entries})
+        committed_seqs = {
+            collection_info["id"]: get_committed_seq(collection_info)
+            async for collection_info in db.users_collections.find({"id": {"$in": channels}}, {"id": 1, "seq": 1, "pending_seq": 1})
+        }
+
+        # erst nach dem Stand neu lesen: alle Einträge bis zu dieser Nummer sind dann sichtbar, auch die,
+        # die erst nach der ersten Abfrage committet wurden
+        entries = await outbox.find({"channel": {"$in": channels}}) \
+            .sort([("channel", ASCENDING), ("seq", ASCENDING)]) \
+            .limit(OUTBOX_BATCH_SIZE) \
+            .to_list(length=None)
+
+        # Einträge ohne seq (vor der Umstellung) und von gelöschten Listen sofort senden
+        return [
+            entry for entry in entries
+            if entry.get("seq") is None or entry["channel"] not in committed_seqs or entry["seq"] <= committed_seqs[entry["channel"]]
+        ]
@@ -1,20 +1,112 @@
-from datetime import time
+from datetime import time, datetime, timezone
+from typing import Dict, Optional
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
 from app.service_scheduled import ScheduledService
 import asyncio
+import os
 
-class DailyCleanupService(ScheduledService):
-    service_name = "Daily Reindex Service"
+REINDEX_FRAGMENTATION_THRESHOLD = float(os.getenv("REINDEX_FRAGMENTATION_THRESHOLD", "0.3"))
+REINDEX_MAX_INDEX_SIZE = int(os.getenv("REINDEX_MAX_INDEX_SIZE", str(512 * 1024 * 1024)))
+REINDEX_MIN_INDEX_SIZE = int(os.getenv("REINDEX_MIN_INDEX_SIZE", str(16 * 1024 * 1024)))
+REINDEX_CONCURRENCY = int(os.getenv("REINDEX_CONCURRENCY", "2"))
+REINDEX_TIME_BUDGET = int(os.getenv("REINDEX_TIME_BUDGET", "1800"))
+
+class IndexMaintenanceService(ScheduledService):
+    service_name = "Index Maintenance Service"
     run_time = time(hour=21, minute=33)
 
     async def run_scheduled_task(self):
         db = self.get_database()
-        self.logger.info(f"[{self.service_name}] Performing daily Reindex...")
-        
-        collections = await db.list_collection_names()
-        #events_collections = [name for name in collections if re.search(r'events$', name)]
+        self.logger.info(f"[{self.service_name}] Checking index statistics...")
+
+        started = datetime.now(timezone.utc)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + REINDEX_TIME_BUDGET
+
+        # Statistiken und Compact teilen sich Parallelität und Zeitbudget, collStats und $indexStats sind auf großen Datenbanken nicht billig
+        semaphore = asyncio.Semaphore(REINDEX_CONCURRENCY)
+        collection_names = [name for name in await db.list_collection_names() if not name.startswith("system.")]
+        scans = await asyncio.gather(*(self.scan_collection(db, name, semaphore, deadline) for name in collection_names))
+        not_scanned = [stats["collection"] for stats in scans if stats and stats.get("status") == "not_scanned"]
+
+        # nur Collections mit großem oder fragmentiertem Index, die mit dem meisten freien Platz zuerst
+        candidates = [stats for stats in scans if stats and "status" not in stats and self.needs_maintenance(stats)]
+        candidates.sort(key=lambda stats: stats["index_free_size"], reverse=True)
+
+        results = await asyncio.gather(*(self.compact_collection(db, stats, semaphore, deadline) for stats in candidates))
+
+        report = {
+            "service": self.service_name,
+            "started": started.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            "duration": round((datetime.now(timezone.utc) - started).total_seconds(), 3),
+            "scanned": len(collection_names) - len(not_scanned),
+            "not_scanned": not_scanned,
+            "candidates": len(candidates),
+            "compacted": sum(1 for result in results if result["status"] == "compacted"),
+            "skipped": sum(1 for result in results if result["status"] == "skipped"),
+            "failed": sum(1 for result in results if result["status"] == "failed"),
+            "collections": results
+        }
+        await db.maintenance_reports.insert_one(report)
+
+        self.logger.info(
+            f"[{self.service_name}] Index maintenance complete: {report['compacted']} compacted, "
+            f"{report['skipped']} skipped (time budget), {report['failed']} failed, "
+            f"{len(not_scanned)} not scanned (time budget) in {report['duration']} s."
+        )
+
+    async def scan_collection(self, db: Database, collection_name: str, semaphore: asyncio.Semaphore, deadline: float) -> Optional[Dict]:
+        async with semaphore:
+            # Zeitbudget aufgebraucht -> im Bericht als "not_scanned" aufführen
+            if asyncio.get_running_loop().time() >= deadline:
+                return {"collection": collection_name, "status": "not_scanned"}
+            return await self.get_index_stats(db, collection_name)
+
+    async def get_index_stats(self, db: Database, collection_name: str) -> Optional[Dict]:
+        try:
+            stats = await db.command("collStats", collection_name)
+            index_usage = await db[collection_name].aggregate([{"$indexStats": {}}]).to_list(length=None)
+        except OperationFailure as e:
+            self.logger.warning(f"[{self.service_name}] no statistics for {collection_name}: {e}")
+            return None
+
+        index_size = stats.get("totalIndexSize", 0)
+        # indexFreeStorageSize: wiederverwendbarer, aber belegter Platz in den Index-Dateien (WiredTiger)
+        index_free_size = stats.get("indexFreeStorageSize", 0)
+
+        return {
+            "collection": collection_name,
+            "index_size": index_size,
+            "index_free_size": index_free_size,
+            "fragmentation": index_free_size / index_size if index_size else 0,
+            "unused_indexes": [index["name"] for index in index_usage if index["accesses"]["ops"] == 0]
+        }
+
+    def needs_maintenance(self, stats: Dict) -> bool:
+        if stats["index_size"] < REINDEX_MIN_INDEX_SIZE:
+            return False
+        return stats["index_size"] >= REINDEX_MAX_INDEX_SIZE or stats["fragmentation"] >= REINDEX_FRAGMENTATION_THRESHOLD
+
+    async def compact_collection(self, db: Database, stats: Dict, semaphore: asyncio.Semaphore, deadline: float) -> Dict:
+        collection_name = stats["collection"]
+        result = stats | {"status": "skipped", "duration": 0}
+
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            if loop.time() >= deadline:
+                return result
 
-        for collectionId in collections:
-            self.logger.info(f"Reindex collection: {collectionId}")
-            await db.command('reIndex', collectionId)
+            # compact blockiert (ab MongoDB 4.4) keine Lese- und Schreibzugriffe, im Gegensatz zu reIndex
+            self.logger.info(f"[{self.service_name}] Compact collection: {collection_name} (fragmentation {stats['fragmentation']:.0%})")
+            start = loop.time()
+            try:
+                response = await db.command("compact", collection_name)
+                result["status"] = "compacted"
+                result["bytes_freed"] = response.get("bytesFreed", 0)
+            except OperationFailure as e:
+                self.logger.error(f"[{self.service_name}] Compact of {collection_name} failed: {e}")
+                result["status"] = "failed"
 
-        self.logger.info(f"[{self.service_name}] Reindex complete.")
+            result["duration"] = round(loop.time() - start, 3)
+            return result
@@ -1,59 +1,101 @@
-from typing import Dict, Callable, List
+from typing import Dict, Callable, List, Optional, Set, Tuple
 import asyncio
+import os
+import socket
 from redis.asyncio import Redis
 from .logger_manager import LoggerManager
+from .tracing import get_trace_fields
 from multiprocessing import current_process
 
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", "1000"))
+
 class RedisStreamManager:
     groups: Dict[str, str] = {}
 
     def __init__(self, redis: Redis):
         self.redis = redis
+        self.streams: Set[str] = set()
+        self.streams_changed = asyncio.Event()
         loggermanager = LoggerManager()
         self.logger = loggermanager.get_logger("Redis Stream Manager")
 
-    async def listen_to_stream(
+    # Ein Stream pro Collection, jeder Worker liest ihn mit einer eigenen Consumer Group
+    def get_stream_key(self, channel_name: str) -> str:
+        return f"stream:{channel_name}"
+
+    def get_worker_group(self) -> str:
+        return f"worker_{socket.gethostname()}_{current_process().pid}"
+
+    # ------------------- dispatcher -------------------
+
+    def add_stream(self, stream_key: str):
+        self.streams.add(stream_key)
+        self.streams_changed.set()
+
+    def remove_stream(self, stream_key: str):
+        self.streams.discard(stream_key)
+
+    async def listen_to_streams(
         self,
-        stream_key: str,
         group: str,
         consumer: str,
-        on_message: Callable[[str, Dict], asyncio.Future],
+        on_messages: Callable[[List[Tuple[str, str, Dict]]], asyncio.Future],
         block: int = 500,
-        count: int = 10
+        count: int = 100
     ):
-        await self.create_group(stream_key, group)
-        self.logger.debug(f"start listening for messages in channel {stream_key}")
+        """Liest alle registrierten Streams des Workers mit einem einzigen XREADGROUP."""
+        self.logger.debug("start stream dispatcher for group %s", group)
 
         while True:
             try:
+                if not self.streams:
+                    self.streams_changed.clear()
+                    await self.streams_changed.wait()
+                    continue
+
+                # neue Streams werden spätestens nach `block` ms mitgelesen
                 messages = await self.redis.xreadgroup(
                     groupname=group,
-                    consumername=f"{consumer}_{current_process().pid}",
-                    streams={stream_key: '>'},
+                    consumername=consumer,
+                    streams={stream_key: '>' for stream_key in self.streams},
                     count=count,
                     block=block
                 )
 
-                for _, entries in messages:
-                    for msg_id, msg_data in entries:
-                        await on_message(msg_id, msg_data)
+                batch = [
+                    (stream_key, msg_id, msg_data)
+                    for stream_key, entries in messages
+                    if stream_key in self.streams
+                    for msg_id, msg_data in entries
+                ]
+
+                if batch:
+                    await on_messages(batch)
 
             except asyncio.CancelledError:
-                self.logger.info(f"Stream listener for {stream_key} cancelled.")
+                self.logger.info("Stream dispatcher for group %s cancelled.", group)
                 break
             except Exception as e:
-                self.logger.error(f"Error in stream listener {stream_key}: {e}")
+                self.logger.error("Error in stream dispatcher %s: %s", group, e)
+                if "NOGROUP" in str(e):
+                    # z. B. Stream wurde gelöscht -> Gruppen der noch registrierten Streams neu anlegen
+                    await self.create_groups(list(self.streams), group)
                 await asyncio.sleep(0.3)
 
+    async def create_groups(self, stream_keys: List[str], group: str):
+        for stream_key in stream_keys:
+            try:
+                await self.create_group(stream_key, group)
+            except Exception as e:
+                self.logger.error("Could not create group %s for stream %s: %s", group, stream_key, e)
+
     async def create_group(self, stream_key, group):
         try:
-            exists = await self.redis.exists(stream_key)
-            if not exists:
-                await self.redis.xgroup_create(name=stream_key, groupname=group, id="$", mkstream=True)
+            await self.redis.xgroup_create(name=stream_key, groupname=group, id="$", mkstream=True)
             self.groups[stream_key] = group
         except Exception as e:
             if "BUSYGROUP" in str(e):
-                self.logger.debug(f"Group {group} for stream {stream_key} already exists.")
+                self.logger.debug("Group %s for stream %s already exists.", group, stream_key)
             else:
                 raise
 
@@ -62,7 +104,7 @@ class RedisStreamManager:
             await self.redis.xgroup_destroy(name=stream_key, groupname=group)
         except Exception as e:
             if "BUSYGROUP" in str(e):
-                self.logger.debug(f"Group {group} for stream {stream_key} already destroyed.")
+                self.logger.debug("Group %s for stream %s already destroyed.", group, stream_key)
             else:
                 raise
 
@@ -72,24 +114,49 @@ class RedisStreamManager:
     data: Dict[str, str],
     group_name: str,
     user_id: str,
-    maxlen: int = None
+    maxlen: int = STREAM_MAXLEN,
+    trace_fields: Optional[Dict[str, str]] = None
 ) -> str:
-        await self.create_group(stream_key, group_name)
-        self.logger.debug(f"add redis message to channel {stream_key}")
+        self.logger.debug("add redis message to channel %s", stream_key)
 
-        send_data = {"channel": group_name, "sender": user_id, "data": data}
+        send_data = self.get_send_data(group_name, user_id, data, trace_fields)
 
-        # Nachricht zum Stream hinzufügen
+        # Nachricht zum Stream hinzufügen. Der Stream wird von allen Workern gelesen,
+        # daher wird er über maxlen gekürzt statt Nachrichten einzeln zu löschen
         if maxlen:
-            msg_id = await self.redis.xadd(stream_key, send_data, maxlen=maxlen)
+            msg_id = await self.redis.xadd(stream_key, send_data, maxlen=maxlen, approximate=True)
         else:
             msg_id = await self.redis.xadd(stream_key, send_data)
 
         return msg_id
 
+    async def add_messages(self, messages: List[Tuple[str, str, str, Dict[str, str], Optional[Dict[str, str]]]], maxlen: int = STREAM_MAXLEN) -> List[str]:
+        """Fügt (stream_key, group_name, user_id, data, trace_fields) Nachrichten mit einem Round-Trip hinzu."""
+        self.logger.debug("add %s redis messages", len(messages))
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream_key, group_name, user_id, data, trace_fields in messages:
+                send_data = self.get_send_data(group_name, user_id, data, trace_fields)
+                if maxlen:
+                    pipe.xadd(stream_key, send_data, maxlen=maxlen, approximate=True)
+                else:
+                    pipe.xadd(stream_key, send_data)
+            return await pipe.execute()
+
+    def get_send_data(self, group_name: str, user_id: str, data, trace_fields: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        # trace_id und produced_at (Zeitpunkt der Änderung) für die Latenz bis zur Auslieferung an die Websockets
+        return {"channel": group_name, "sender": user_id, "data": data} | (trace_fields or get_trace_fields())
+
     async def ack_message(self, channel: str, group: str, msg_id: str):
         await self.redis.xack(channel, group, msg_id)
 
+    async def ack_messages(self, msg_ids_of_streams: Dict[str, List[str]], group: str):
+        """Bestätigt einen ganzen Batch (ein XACK pro Stream) mit einem Round-Trip."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream_key, msg_ids in msg_ids_of_streams.items():
+                pipe.xack(stream_key, group, *msg_ids)
+            await pipe.execute()
+
     async def delete_message(self, channel: str, msg_id: str):
         await self.redis.xdel(channel, msg_id)
 
@@ -109,13 +176,17 @@ class RedisStreamManager:
         return await self.redis.smembers(f"user:{user_id}:channels")
 
     async def add_user_to_channel(self, channel_name: str, user_id: str):
-        self.logger.debug(f"add_user_to_channel {channel_name}_{user_id}")
-        await self.redis.sadd(f"channel:{channel_name}", user_id)
-        await self.redis.sadd(f"channel:{channel_name}_{user_id}", user_id)
-        await self.redis.sadd(f"user:{user_id}:channels", channel_name)
+        self.logger.debug("add_user_to_channel %s_%s", channel_name, user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(f"channel:{channel_name}", user_id)
+            pipe.sadd(f"channel:{channel_name}_{user_id}", user_id)
+            pipe.sadd(f"user:{user_id}:channels", channel_name)
+            await pipe.execute()
 
     async def remove_user_from_channel(self, channel_name: str, user_id: str):
-        self.logger.debug(f"remove_user_from_channel {channel_name}_{user_id}")
-        await self.redis.srem(f"channel:{channel_name}_{user_id}", user_id)
-        await self.redis.srem(f"user:{user_id}:channels", channel_name)
+        self.logger.debug("remove_user_from_channel %s_%s", channel_name, user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.srem(f"channel:{channel_name}_{user_id}", user_id)
+            pipe.srem(f"user:{user_id}:channels", channel_name)
+            await pipe.execute()
 
@@ -0,0 +1,71 @@
+from typing import Optional
+from fastapi import Depends, APIRouter, status, Query
+from pymongo import DESCENDING
+from pymongo.database import Database
+
+from ..logger_manager import LoggerManager
+from ..connection_manager import ConnectionManager
+from ..database_manager import get_db
+from ..authentication.auth_methods import get_current_active_user, verify_admin_key
+from ..collections.helper_methods import get_items_collection, get_events_collection
+from ..collections.index_advisor import get_index_recommendations, INDEX_ADVISOR_THRESHOLD
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(get_current_active_user), Depends(verify_admin_key)],
+    responses={status.HTTP_404_NOT_FOUND: {"description": "Not found"}},
+)
+
+# Logging
+logger_instance = LoggerManager()
+logger = logger_instance.get_logger("Admin")
+
+
+@router.get("/indexes/recommendations")
+async def get_recommendations(
+    collection_id: Optional[str] = Query(
+        None,
+        description="nur Empfehlungen für diese Collection (und ihre Events)"
+    ),
+    threshold: int = Query(
+        INDEX_ADVISOR_THRESHOLD,
+        ge=1,
+        description="Anzahl gleicher Abfragen, ab der ein Index empfohlen wird"
+    ),
+    ):
+    collection_names = None
+    if collection_id:
+        # im Modus "shared" die gemeinsamen Collections `items` und `item_events`
+        collection_names = [(await get_items_collection(collection_id)).name, (await get_events_collection(collection_id)).name]
+
+    recommendations = await get_index_recommendations(collection_names, threshold)
+
+    logger.info(f"{len(recommendations)} index recommendations retreaved")
+    return {"source": "db", "data": recommendations}
+
+
+@router.get("/maintenance/reports")
+async def get_maintenance_reports(
+    limit: int = Query(
+        10,
+        ge=1,
+        le=100,
+        description="Anzahl der letzten Berichte der Index-Wartung"
+    ),
+    db: Database = Depends(get_db)
+    ):
+    reports = await db.maintenance_reports.find({}, {"_id": 0}).sort("started", DESCENDING).limit(limit).to_list(length=None)
+
+    logger.info(f"{len(reports)} maintenance reports retreaved")
+    return {"source": "db", "data": reports}
+
+
+# Ausgangs-Queues und Lag der Websocket-Verbindungen dieses Workers, enthält die Namen aller verbundenen Benutzer
+@router.get("/connections/lag")
+async def get_connection_lags():
+    connections = ConnectionManager().get_connection_lags()
+
+    logger.info(f"lag of {len(connections)} connections retreaved")
+    return {"source": "worker", "data": connections}
@@ -11,7 +11,9 @@ from ..connection_manager import ConnectionManager
 from ..authentication.models import User
 from ..authentication.auth_methods import get_current_active_user
 from ..database_manager import get_db, get_redis
-from ..collections.helper_methods import get_collection_in_db, get_collection_info, create_collection, delete_collection
+from ..collections.helper_methods import get_collection_in_db, get_collection_info, create_collection, delete_collection, \
+    PUBLIC_COLLECTION_PROJECTION
+from ..collections.collection_storage import is_shared_storage, STORAGE_SHARED
 
 
 router = APIRouter(
@@ -36,15 +38,12 @@ logger = logger_instance.get_logger("Collections")
 @router.get("/list")
 async def get_collections(current_user: User = Depends(get_current_active_user), db: Database = Depends(get_db)):
     # get collection
-    collections = db.users_collections.find({"users": current_user.username})
+    # ohne _id und interne Felder (seq, pending_seq, storage)
+    collections = db.users_collections.find({"users": current_user.username}, PUBLIC_COLLECTION_PROJECTION)
 
     # get items
     data = await collections.to_list(length=None)
 
-    # Entfernen von _id aus jedem Element
-    for item in data:
-        del item["_id"]
-
     collection_json = {"data": data}
 
     return {"source": "db"} | collection_json
@@ -84,7 +83,7 @@ async def create_table(
                 "owner": user_id,  # Besitzer speichern
                 "last_modified": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),  # datum speichern
                 "purpose": purpose
-            },
+            } | ({"storage": STORAGE_SHARED} if is_shared_storage() else {}),  # neue Listen müssen nicht migriert werden
             "$addToSet": {"users": user_id}  # Benutzer nur hinzufügen, falls noch nicht vorhanden
         },
         upsert=True  # Erstellt den Eintrag, falls er noch nicht existiert
@@ -108,21 +107,15 @@ async def delete_table(
         {"id": collection_id}
     )
 
-    # delete collection
+    # delete collection (entfernt auch die gecachten Items)
     await delete_collection(collection_id)
 
-    #remove cached item
-    redis_key = f"collection_cache:{collection_id}_no_filter"
-    await redis_client.delete(redis_key)
-
     logger.info(f"collection {collection_id} deleted")
     return {"message": f"Collection deleted successfully",  "id": collection_id}
 
 @router.get("/{collection_id}/info")
 async def get_items(collection_id: str, current_user: User = Depends(get_current_active_user)):
-    collection_info = await get_collection_info(collection_id)
-
-    del collection_info["_id"]
+    collection_info = await get_collection_info(collection_id, PUBLIC_COLLECTION_PROJECTION)
 
     logger.info(f"collection info {collection_id} retreaved")
     return {"source": "db", "data": collection_info}
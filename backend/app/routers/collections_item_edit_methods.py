@@ -1,11 +1,12 @@
 from datetime import datetime, timezone
 from fastapi import HTTPException, Depends, APIRouter, status, Query
 from bson import ObjectId
+from bson.errors import InvalidId
 import json
 
 from pymongo import ReturnDocument
-from pymongo.collection import Collection, InsertOneResult
-from typing import Dict, Optional
+from pymongo.collection import InsertOneResult
+from typing import Dict, List, Optional
 from redis import Redis
 
 from ..logger_manager import LoggerManager
@@ -14,7 +15,10 @@ from ..authentication.models import User
 from ..authentication.auth_methods import get_current_active_user
 from ..database_manager import get_redis
 from ..collections.collection_filter import parse_filter_string
-from ..collections.helper_methods import get_collection_by_id, get_collection_info, update_modified_status_of_collection, add_item_event
+from ..collections.collection_storage import ScopedCollection
+from ..collections.helper_methods import get_items_collection, create_item_event, get_item_update
+from ..collections.item_outbox import commit_item_change
+from ..collections.models import BulkOperation
 
 router = APIRouter(
     prefix="/collections",
@@ -37,62 +41,53 @@ logger = logger_instance.get_logger("Collections")
 @router.post("/{collection_id}/item")
 async def create_item(collection_id: str, item: Dict, current_user: User = Depends(get_current_active_user)):
     # get collection
-    collection: Collection = await get_collection_by_id(collection_id)
-    # Insert the item into the collection
-    result: InsertOneResult = await collection.insert_one(item)
+    collection: ScopedCollection = await get_items_collection(collection_id)
 
-    # add item event
-    await add_item_event(collection_id, "created", item)
+    async def write(session, seq: int):
+        item["seq"] = seq
+        # Insert the item into the collection (insert_one setzt die _id direkt im Dokument)
+        await collection.insert_one(item, session=session)
 
-    # update modified date
-    await update_modified_status_of_collection(collection_id)
+        # Sicherstellen, dass das Item JSON-serialisierbar ist (z. B. ObjectId in String umwandeln)
+        created_item = {key: value for key, value in item.items() if key != "_id"} | {"id": str(item["_id"])}
+        return [create_item_event("created", item, item["seq"])], {"event": "created", "item": created_item}
 
-    item_id = str(result.inserted_id)
-
-    # Das aktualisierte Item abrufen
-    created_item = await collection.find_one({"_id": ObjectId(item_id)})
-
-    # Sicherstellen, dass das Item JSON-serialisierbar ist (z. B. ObjectId in String umwandeln)
-    if created_item:
-        created_item["id"] = str(created_item["_id"])  # ObjectId in String umwandeln
-        del created_item["_id"]
+    # Item, Event und WebSocket-Nachricht (Outbox) gemeinsam speichern
+    message = await commit_item_change(collection_id, current_user.username, write, shared=collection.is_scoped)
 
     logger.info(f"item in collection {collection_id} created")
 
-    # Publish a WebSocket notification
-    await sockets.send_to_channel(f"{current_user.username}", f"{collection_id}", json.dumps({"event": "created", "item": created_item}))
-
     # Return the inserted item's ID
-    return {"message": "Item created", "id": item_id}
+    return {"message": "Item created", "id": message["item"]["id"]}
 
 # MongoDB: Einzelnes Item bearbeiten
 @router.put("/{collection_id}/item/{item_id}")
 async def update_item(collection_id: str, item_id: str, updates: Dict, current_user: User = Depends(get_current_active_user)):
     # get collection
-    collection = await get_collection_by_id(collection_id)
-    # update item
-    updated_item = await collection.find_one_and_update({"_id": ObjectId(item_id)}, {"$set": updates}, return_document=ReturnDocument.AFTER)
+    collection: ScopedCollection = await get_items_collection(collection_id)
 
-    if updated_item is None:
-        logger.warning(f"item {item_id} not in collection {collection_id}")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    async def write(session, seq: int):
+        # update item
+        updated_item = await collection.find_one_and_update(
+            {"_id": ObjectId(item_id)},
+            get_item_update(updates, seq),
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
 
-    # add item event
-    await add_item_event(collection_id, "edited", updated_item)
+        if updated_item is None:
+            logger.warning(f"item {item_id} not in collection {collection_id}")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
 
-    # update modified date
-    await update_modified_status_of_collection(collection_id)
+        # Sicherstellen, dass das Item JSON-serialisierbar ist (z. B. ObjectId in String umwandeln)
+        changed_item = {key: value for key, value in updated_item.items() if key != "_id"} | {"id": item_id}
+        return [create_item_event("edited", updated_item, seq)], {"event": "edited", "item": changed_item}
 
-    # Sicherstellen, dass das Item JSON-serialisierbar ist (z. B. ObjectId in String umwandeln)
-    if updated_item:
-        updated_item["id"] = str(updated_item["_id"])  # ObjectId in String umwandeln
-        del updated_item["_id"]
+    # Item, Event und WebSocket-Nachricht (Outbox) gemeinsam speichern
+    await commit_item_change(collection_id, current_user.username, write, shared=collection.is_scoped)
 
     logger.info(f"item in collection {collection_id} updated")
 
-    # Publish a WebSocket notification
-    await sockets.send_to_channel(f"{current_user.username}", f"{collection_id}", json.dumps({"event": "edited", "item": updates}))
-
     return {"message": "Item updated", "id": item_id}
 
 
@@ -100,24 +95,114 @@ async def update_item(collection_id: str, item_id: str, updates: Dict, current_u
 @router.delete("/{collection_id}/item/{item_id}")
 async def delete_item(collection_id: str, item_id: str, current_user: User = Depends(get_current_active_user)):
     # get collection
-    collection = await get_collection_by_id(collection_id)
+    collection: ScopedCollection = await get_items_collection(collection_id)
 
-    # delete item
-    deleted_item = await collection.find_one_and_delete({"_id": ObjectId(item_id)})
+    async def write(session, seq: int):
+        # delete item
+        deleted_item = await collection.find_one_and_delete({"_id": ObjectId(item_id)}, session=session)
 
-    if deleted_item is None:
-        logger.warning(f"item {item_id} not in collection {collection_id}")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+        if deleted_item is None:
+            logger.warning(f"item {item_id} not in collection {collection_id}")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
 
-    # add item event
-    await add_item_event(collection_id, "removed", deleted_item)
+        return [create_item_event("removed", deleted_item, seq)], {"event": "removed", "id": f"{item_id}"}
 
-    # update modified date
-    await update_modified_status_of_collection(collection_id)
+    # Löschung, Event und WebSocket-Nachricht (Outbox) gemeinsam speichern
+    await commit_item_change(collection_id, current_user.username, write, shared=collection.is_scoped)
 
     logger.info(f"item in collection {collection_id} deleted")
 
-    # Publish a WebSocket notification
-    await sockets.send_to_channel(f"{current_user.username}", f"{collection_id}", json.dumps({"event": "removed", "id": f"{item_id}"}))
-
     return {"message": "Item deleted", "id": item_id}
+
+
+# MongoDB: Mehrere Items in einem Request erstellen, bearbeiten und löschen
+@router.post("/{collection_id}/items/bulk")
+async def bulk_edit_items(collection_id: str, operations: List[BulkOperation], current_user: User = Depends(get_current_active_user)):
+    if not operations:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No operations")
+
+    # get collection
+    collection: ScopedCollection = await get_items_collection(collection_id)
+
+    try:
+        referenced_ids = {ObjectId(operation.id) for operation in operations if operation.op != "create"}
+    except (InvalidId, TypeError):
+        logger.warning(f"invalid item id in bulk request for collection {collection_id}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid item id")
+
+    async def write(session, first_seq: int):
+        # Betroffene Items mit einem Request lesen (für Events und Existenzprüfung)
+        existing_items = {}
+        if referenced_ids:
+            async for existing_item in collection.find({"_id": {"$in": list(referenced_ids)}}, session=session):
+                existing_items[existing_item["_id"]] = existing_item
+
+        missing_ids = [str(item_id) for item_id in referenced_ids if item_id not in existing_items]
+        if missing_ids:
+            logger.warning(f"items {missing_ids} not in collection {collection_id}")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Items not found: {missing_ids}")
+
+        # eine Sequenznummer pro Operation (mit einem Request in commit_item_change reserviert)
+        sequence_numbers = range(first_seq, first_seq + len(operations))
+
+        write_requests = []
+        created_items = []
+        for operation, seq in zip(operations, sequence_numbers):
+            match operation.op:
+                case "create":
+                    # bulk_write setzt die _id direkt im Dokument
+                    created_item = dict(operation.item) | {"seq": seq}
+                    created_items.append(created_item)
+                    write_requests.append(collection.insert_request(created_item))
+                case "update":
+                    write_requests.append(collection.update_request({"_id": ObjectId(operation.id)}, get_item_update(operation.item, seq)))
+                case "delete":
+                    write_requests.append(collection.delete_request({"_id": ObjectId(operation.id)}))
+
+        await collection.bulk_write(write_requests, ordered=True, session=session)
+
+        for created_item in created_items:
+            collection.unscope(created_item)
+
+        # Ergebnis der Updates mit einem Request lesen
+        updated_ids = [ObjectId(operation.id) for operation in operations if operation.op == "update"]
+        updated_items = {}
+        if updated_ids:
+            async for updated_item in collection.find({"_id": {"$in": updated_ids}}, session=session):
+                updated_items[updated_item["_id"]] = updated_item
+
+        events = []
+        changes = []
+        created_items_iter = iter(created_items)
+        for operation, seq in zip(operations, sequence_numbers):
+            match operation.op:
+                case "create":
+                    item = next(created_items_iter)
+                    events.append(create_item_event("created", item, seq))
+                    changes.append({"event": "created", "item": item})
+                case "update":
+                    item_id = ObjectId(operation.id)
+                    item = updated_items.get(item_id, existing_items[item_id] | operation.item | {"seq": seq})
+                    events.append(create_item_event("edited", item, seq))
+                    changes.append({"event": "edited", "item": item})
+                case "delete":
+                    events.append(create_item_event("removed", existing_items[ObjectId(operation.id)], seq))
+                    changes.append({"event": "removed", "id": operation.id})
+
+        # Sicherstellen, dass die Items JSON-serialisierbar sind (z. B. ObjectId in String umwandeln)
+        for change in changes:
+            item = change.get("item")
+            if item is not None:
+                change["item"] = {key: value for key, value in item.items() if key != "_id"} | {"id": str(item["_id"])}
+
+        # eine aggregierte WebSocket-Nachricht
+        return events, {"event": "bulk", "changes": changes}
+
+    # Items, Events und WebSocket-Nachricht (Outbox) gemeinsam speichern
+    message = await commit_item_change(collection_id, current_user.username, write, seq_count=len(operations), shared=collection.is_scoped)
+
+    ids = [change["item"]["id"] if "item" in change else change["id"] for change in message["changes"]]
+
+    logger.info(f"{len(operations)} items in collection {collection_id} changed")
+
+    return {"message": "Items changed", "ids": ids}
@@ -3,20 +3,28 @@ from fastapi import HTTPException, Depends, APIRouter, status, Query
 from bson import ObjectId
 import json
 
-from pymongo import ReturnDocument
-from pymongo.collection import Collection, InsertOneResult
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.collection import InsertOneResult
 from typing import Dict, Optional
 from redis import Redis
-from itertools import groupby
-from operator import itemgetter
 
 from ..logger_manager import LoggerManager
 from ..connection_manager import ConnectionManager
 from ..authentication.models import User
 from ..authentication.auth_methods import get_current_active_user
-from ..database_manager import get_redis
-from ..collections.collection_filter import parse_filter_string
-from ..collections.helper_methods import get_collection_by_id, get_collection_info, update_modified_status_of_collection, add_item_event
+from ..database_manager import get_redis_bytes
+from ..metrics import collection_cache_requests
+from ..collections.collection_filter import parse_filter_string, parse_sort_string
+from ..collections.collection_cache import CollectionCache
+from ..collections.collection_changes import group_and_sort_changes, remove_not_important_changes, \
+    build_compact_changes_pipeline
+from ..collections.collection_cursor import build_sort_spec, apply_cursor, encode_cursor
+from ..collections.stream_response import NDJSONResponse, stream_ndjson, STREAM_BATCH_SIZE
+from ..collections.index_advisor import record_query_shape
+from ..collections.cache_response import CachedJSONResponse, dump_json, splice_source
+from ..collections.collection_storage import ScopedCollection
+from ..collections.helper_methods import get_items_collection, get_events_collection, get_collection_info, update_modified_status_of_collection, add_item_event, \
+    get_cache_generation, get_committed_seq
 
 router = APIRouter(
     prefix="/collections",
@@ -29,6 +37,7 @@ cache_time = 300
 
 # Manager-Instanz erstellen
 sockets = ConnectionManager()
+local_cache = CollectionCache()
 
 # Logging
 logger_instance = LoggerManager()
@@ -54,30 +63,69 @@ async def get_items(
         None,
         description="Limit-String wie '50'"
     ),
+    after: Optional[str] = Query(
+        None,
+        description="Cursor aus 'next' der vorherigen Seite (zusammen mit limit statt skip)"
+    ),
     distinct: Optional[str] = Query(
         None,
         description="distinct Feld wie 'id' oder 'unique_item_name'"
     ),
+    format: Optional[str] = Query(
+        None,
+        description="'ndjson' für eine gestreamte Antwort (eine Zeile pro Dokument)"
+    ),
     current_user: User = Depends(get_current_active_user),
-    redis_client: Redis = Depends(get_redis)
+    redis_client: Redis = Depends(get_redis_bytes)
     ):
-    # 1. In Redis nachsehen
-    redis_key = f"collection_cache:{collection_id}:{filter or ''}:{sort or ''}:{skip or ''}:{limit or ''}"
-    cached_data = await redis_client.get(redis_key)
+    stream = is_ndjson_format(format, distinct)
+
+    # 1. Im lokalen Cache des Workers nachsehen (gestreamte Antworten werden nicht gecacht)
+    cache_variant = f"{filter or ''}:{sort or ''}:{skip or ''}:{limit or ''}:{after or ''}"
+    local_version = local_cache.get_version(collection_id)
+    local_data = None if stream else local_cache.get(collection_id, cache_variant)
+    if local_data:
+        collection_cache_requests.labels(endpoint="get_items", result="local").inc()
+        return CachedJSONResponse(local_data)
+
+    # 2. In Redis nachsehen
+    generation = await get_cache_generation(collection_id)
+    redis_key = f"collection_cache:{collection_id}:{generation}:{cache_variant}"
+    cached_data = None if stream else await redis_client.get(redis_key)
     if cached_data:
-        # Daten aus Redis zurückgeben
-        return {"source": "cache"} | json.loads(cached_data)
+        collection_cache_requests.labels(endpoint="get_items", result="redis").inc()
+        # Daten aus Redis ohne Parsen zurückgeben
+        response_data = splice_source(cached_data, "cache")
+        local_cache.set(collection_id, cache_variant, response_data, local_version)
+        return CachedJSONResponse(response_data)
+
+    if not stream:
+        collection_cache_requests.labels(endpoint="get_items", result="miss").inc()
 
     # get collection
-    collection: Collection = await get_collection_by_id(collection_id)
+    collection: ScopedCollection = await get_items_collection(collection_id)
     collection_name = (await get_collection_info(collection_id))["collection_name"]
 
     # get items
     mongo_filter = parse_filter_string(filter)
+    sort_filter = parse_sort_string(sort)
+
+    # Form der Abfrage für den Index Advisor merken
+    await record_query_shape(collection.name, collection.scope(mongo_filter), sort_filter)
+
+    # Keyset-Pagination: Sortierung mit _id eindeutig machen und ab dem Cursor lesen (Index Range Scan statt skip)
+    paginate = (after is not None or limit) and not skip and not distinct
+    sort_spec = build_sort_spec(sort_filter) if paginate else None
+
+    if paginate:
+        mongo_filter = apply_cursor(mongo_filter, sort_spec, after)
+
     items = collection.find(mongo_filter)
 
-    if sort:
-        items = items.sort(parse_filter_string(sort))
+    if paginate:
+        items = items.sort(sort_spec)
+    elif sort_filter:
+        items = items.sort(sort_filter)
 
     if limit:
         items = items.limit(int(limit))
@@ -85,23 +133,78 @@ async def get_items(
     if skip:
         items = items.skip(int(skip))
 
+    if stream:
+        logger.info(f"collection {collection_id} streamed")
+        items = items.batch_size(STREAM_BATCH_SIZE)
+        return NDJSONResponse(stream_ndjson({"source": "db", "name": collection_name}, items, convert_item_id))
+
     if distinct:
         items = items.distinct(distinct)
 
     data = await items.to_list(length=None)
 
+    data_json = {"name": collection_name, "data": data}
+
+    if paginate:
+        # Cursor für die nächste Seite, solange die Seite voll ist
+        data_json["next"] = encode_cursor(data[-1], sort_spec) if limit and data and len(data) >= int(limit) else None
+
     # ObjectId in String umwandeln
     for item in data:
-        item["id"] = str(item["_id"])
-        del item["_id"]
+        convert_item_id(item)
 
-    data_json = {"name": collection_name, "data": data}
+    data_json = dump_json(data_json)
 
-    # 3. Daten in Redis cachen
-    await redis_client.set(redis_key, json.dumps(data_json), ex=cache_time)
+    # 3. Daten in Redis und im lokalen Cache cachen
+    await redis_client.set(redis_key, data_json, ex=cache_time)
+    local_cache.set(collection_id, cache_variant, splice_source(data_json, "cache"), local_version)
 
     logger.info(f"collection {collection_id} retreaved")
-    return {"source": "db"} | data_json
+    return CachedJSONResponse(splice_source(data_json, "db"))
+
+@router.get("/{collection_id}/sync")
+async def sync_items(
+    collection_id: str,
+    since: int = Query(
+        0,
+        ge=0,
+        description="letzte bekannte Sequenznummer (seq) des Clients, 0 für eine vollständige Synchronisation"
+    ),
+    current_user: User = Depends(get_current_active_user),
+    ):
+    collection_info = await get_collection_info(collection_id)
+    # Stand vor dem Lesen: alle Änderungen bis hierhin sind geschrieben und im Ergebnis enthalten.
+    # Noch laufende Schreibvorgänge mit kleinerer Nummer kommen beim nächsten Sync (seq > since) mit.
+    current_seq = get_committed_seq(collection_info)
+
+    collection: ScopedCollection = await get_items_collection(collection_id)
+    collection_events: ScopedCollection = await get_events_collection(collection_id)
+
+    # aktueller Stand aller seit `since` geänderten Items (Index auf seq)
+    items_filter = {"seq": {"$gt": since}} if since > 0 else {}
+    items = await collection.find(items_filter).sort("seq", ASCENDING).to_list(length=None)
+
+    for item in items:
+        item["id"] = str(item["_id"])
+        del item["_id"]
+
+    # Tombstones für gelöschte Items
+    removed = []
+    if since > 0:
+        removed_events = collection_events.find(
+            {"seq": {"$gt": since}, "event": "removed"},
+            {"item._id": 1}
+        )
+        removed = [str(removed_event["item"]["_id"]) async for removed_event in removed_events]
+
+    logger.info(f"collection {collection_id} synced since {since}")
+    return {
+        "source": "db",
+        "name": collection_info["collection_name"],
+        "seq": current_seq,
+        "data": items,
+        "removed": removed
+    }
 
 @router.get("/{collection_id}/changes")
 async def get_changes(
@@ -122,38 +225,54 @@ async def get_changes(
         True,
         description="true oder false für alle Änderungen oder nur die wichtigsten pro item"
     ),
+    format: Optional[str] = Query(
+        None,
+        description="'ndjson' für eine gestreamte Antwort (eine Zeile pro Dokument)"
+    ),
     current_user: User = Depends(get_current_active_user),
     ):
+    stream = is_ndjson_format(format, distinct)
 
-    collection_events_key = f"{collection_id}_events"
     # get collection
-    collection: Collection = await get_collection_by_id(collection_events_key)
+    collection: ScopedCollection = await get_events_collection(collection_id)
     collection_name = (await get_collection_info(collection_id))["collection_name"]
 
     # get items
     mongo_filter = parse_filter_string(filter)
-    items = collection.find(mongo_filter)
+    sort_filter = parse_sort_string(sort)
 
-    if sort:
-        items = items.sort(parse_filter_string(sort))
+    # Form der Abfrage für den Index Advisor merken
+    await record_query_shape(collection.name, collection.scope(mongo_filter), sort_filter)
 
-    if distinct:
-        items = items.distinct(distinct)
+    if not history and not distinct:
+        # Verdichtung direkt in MongoDB, statt alle Events nach Python zu laden
+        items = collection.aggregate(build_compact_changes_pipeline(mongo_filter), allowDiskUse=True)
+    else:
+        items = collection.find(mongo_filter)
+
+        if sort_filter:
+            items = items.sort(sort_filter)
+
+        if distinct:
+            items = items.distinct(distinct)
+
+    if stream:
+        logger.info(f"collection {collection_id} changes streamed")
+        items = items.batch_size(STREAM_BATCH_SIZE)
+        return NDJSONResponse(stream_ndjson({"source": "db", "name": collection_name}, items, convert_event_id))
 
     data = await items.to_list(length=None)
 
     # ObjectId in String umwandeln
     for item in data:
-        item["item"]["id"] = str(item["item"]["_id"])
-        del item["_id"]
-        del item["item"]["_id"]
+        convert_event_id(item)
 
-    logger.info(f"data={data}")
+    logger.debug("data=%s", data)
 
-    if not history:
+    if not history and distinct:
         items_events_grouped = group_and_sort_changes(data)
         data = remove_not_important_changes(items_events_grouped)
-        logger.info(f"filtered={data}")
+        logger.debug("filtered=%s", data)
 
 
     data_json = {"name": collection_name, "data": data}
@@ -162,44 +281,29 @@ async def get_changes(
     return {"source": "db"} | data_json
 
 
-def remove_not_important_changes(items_events_grouped) -> list[Dict]:
-    data = []
-    for collection_id, item_events in items_events_grouped.items():
-        created = None
-        edited = None
-        removed = None
-
-        for item_event in item_events:
-            match item_event["event"]:
-                case "created":
-                    created = item_event
-                case "edited":
-                    edited = item_event
-                case "removed":
-                    removed = item_event
-                case _:  # default case
-                    raise ValueError(f"unknown event: {item_event['event']}")
+def is_ndjson_format(format: Optional[str], distinct: Optional[str]) -> bool:
+    if format is None:
+        return False
 
-        if created is not None and edited is not None and removed is None:
-            data.append(created)
-            data.append(edited)
+    if format != "ndjson":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown format '{format}'")
 
-        elif created is not None and edited is None and removed is None:
-            data.append(created)
-
-        elif created is None and edited is not None and removed is None:
-            data.append(edited)
+    if distinct:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="distinct is not supported with format=ndjson")
 
-        elif created is None and removed is not None:
-            data.append(removed)
+    return True
 
-    return data
 
+def convert_item_id(item: Dict) -> Dict:
+    # ObjectId in String umwandeln
+    item["id"] = str(item["_id"])
+    del item["_id"]
+    return item
 
-def group_and_sort_changes(items: list[Dict]) -> Dict:
-    items_sorted = sorted(items, key=lambda x: (x["item"]["id"], x["timestamp"]))
 
-    return {
-        _id: list(group)
-        for _id, group in groupby(items_sorted, key=lambda x: (x["item"]["id"]))
-    }
\ No newline at end of file
+def convert_event_id(item_event: Dict) -> Dict:
+    # ObjectId in String umwandeln
+    item_event["item"]["id"] = str(item_event["item"]["_id"])
+    del item_event["_id"]
+    del item_event["item"]["_id"]
+    return item_event
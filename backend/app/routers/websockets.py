@@ -73,4 +73,4 @@ async def remove_user_from_channel(channel_name: str, current_user: User = Depen
 @router.get("/channel/{channel_name}/members")
 async def get_channel_members(channel_name: str, current_user: User = Depends(get_current_active_user)):
     members = await manager.get_users_of_channel(channel_name)
-    return {"members": members}
\ No newline at end of file
+    return {"members": members}
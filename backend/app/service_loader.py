@@ -4,6 +4,7 @@ import asyncio
 from app.logger_manager import LoggerManager
 from app.service_base import BaseService
 from app.database_manager import DatabaseManager
+from app.tracing import init_tracing
 
 logger_instance = LoggerManager()
 logger = logger_instance.get_logger("Service Loader")
@@ -13,6 +14,7 @@ database_manager = DatabaseManager()
 PLUGIN_FOLDER = os.path.join(os.path.dirname(__file__), "plugins")
 
 async def load_services():
+    init_tracing()
     await database_manager.init()
     
     logger.info("Starting background services...")
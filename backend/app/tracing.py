@@ -0,0 +1,81 @@
+import os
+import time
+import uuid
+from contextlib import nullcontext
+from typing import Dict, Optional
+
+# OpenTelemetry ist optional: ohne die Pakete (opentelemetry-sdk, opentelemetry-exporter-otlp,
+# opentelemetry-instrumentation-fastapi, opentelemetry-instrumentation-pymongo) bleibt nur die Trace-ID im Stream
+try:
+    from opentelemetry import trace, propagate
+except ImportError:
+    trace = None
+    propagate = None
+
+TRACING = os.getenv("TRACING", "0")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "einkaufsliste_backend")
+
+tracing_initialized = False
+
+
+def is_tracing_enabled() -> bool:
+    return TRACING == "1" and trace is not None
+
+
+def init_tracing(app=None):
+    """Richtet den Tracer Provider ein und instrumentiert FastAPI und pymongo (auch unter Motor)."""
+    global tracing_initialized
+
+    if tracing_initialized or not is_tracing_enabled():
+        return
+    tracing_initialized = True
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    # Endpunkt über OTEL_EXPORTER_OTLP_ENDPOINT
+    provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+
+    from opentelemetry.instrumentation.pymongo import PymongoInstrumentor
+    PymongoInstrumentor().instrument()
+
+    if app is not None:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics")
+
+
+def get_trace_fields(trace_id: Optional[str] = None, produced_at: Optional[float] = None) -> Dict[str, str]:
+    """
+    Felder, die eine Änderung vom Request bis zum Websocket begleiten: Trace-ID, Zeitpunkt der
+    Änderung (Unix-Zeit, alle Prozesse laufen auf demselben Host) und bei aktivem Tracing der W3C traceparent.
+    """
+    fields = {}
+    if is_tracing_enabled():
+        propagate.inject(fields)
+        span_context = trace.get_current_span().get_span_context()
+        if trace_id is None and span_context.is_valid:
+            trace_id = format(span_context.trace_id, "032x")
+
+    fields["trace_id"] = trace_id or uuid.uuid4().hex
+    fields["produced_at"] = repr(produced_at if produced_at is not None else time.time())
+    return fields
+
+
+def get_produced_at(fields: Dict) -> Optional[float]:
+    try:
+        return float(fields["produced_at"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def start_span(name: str, fields: Optional[Dict] = None, **attributes):
+    """Span als Kind des Kontexts aus `fields` (z. B. einer Stream-Nachricht); ohne Tracing ein leerer Kontext."""
+    if not is_tracing_enabled():
+        return nullcontext()
+
+    context = propagate.extract(fields) if fields else None
+    return trace.get_tracer("einkaufsliste").start_as_current_span(name, context=context, attributes=attributes)
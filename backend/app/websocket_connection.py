@@ -0,0 +1,136 @@
+from __future__ import annotations
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from fastapi import WebSocket
+
+from .logger_manager import LoggerManager
+from .metrics import websocket_send_lag, websocket_outbound_queue_depth, websocket_dropped_messages, item_delivery_latency
+from .tracing import get_produced_at, start_span
+
+QUEUE_SIZE = int(os.getenv("WEBSOCKET_QUEUE_SIZE", "100"))
+OVERFLOW_POLICY = os.getenv("WEBSOCKET_OVERFLOW_POLICY", "drop-oldest")  # drop-oldest, coalesce oder disconnect
+
+# Bei "coalesce" ersetzt diese Nachricht alle wartenden Nachrichten, der Client lädt die Collection neu
+RESYNC_MESSAGE = json.dumps({"event": "resync"})
+
+
+class WebsocketConnection:
+    """
+    Websocket mit eigener, begrenzter Ausgangs-Queue und eigenem Writer Task,
+    damit ein langsamer Client die Auslieferung an die anderen nicht verzögert.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str, channel_name: str, queue_size: int = QUEUE_SIZE, overflow_policy: str = OVERFLOW_POLICY):
+        logger_instance = LoggerManager()
+        self.logger = logger_instance.get_logger("Connection Manager")
+
+        self.websocket = websocket
+        self.user_id = user_id
+        self.channel_name = channel_name
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+
+        # (eingereiht um, Nachricht, trace_id/produced_at/traceparent der Stream-Nachricht)
+        self.queue: Deque[Tuple[float, str, Optional[Dict]]] = deque()
+        self.message_available = asyncio.Event()
+        self.closed = False
+
+        # Lag-Metriken dieser Verbindung
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.sent_messages = 0
+        self.dropped_messages = 0
+
+        self.writer_task: Optional[asyncio.Task] = asyncio.create_task(self.writer())
+        # Referenz halten, sonst kann der Task vor dem Schließen vom Garbage Collector entfernt werden
+        self.close_task: Optional[asyncio.Task] = None
+
+    def send(self, message: str, trace_fields: Optional[Dict] = None) -> bool:
+        """Reiht die Nachricht ein. Gibt False zurück, wenn die Verbindung nicht mehr bedient wird."""
+        if self.closed:
+            return False
+
+        if len(self.queue) >= self.queue_size:
+            if not self.handle_overflow():
+                return False
+
+        self.queue.append((time.monotonic(), message, trace_fields))
+        websocket_outbound_queue_depth.inc()
+        self.message_available.set()
+        return True
+
+    def handle_overflow(self) -> bool:
+        match self.overflow_policy:
+            case "coalesce":
+                self.drop(len(self.queue))
+                self.queue.append((time.monotonic(), RESYNC_MESSAGE, None))
+                websocket_outbound_queue_depth.inc()
+                return True
+            case "disconnect":
+                self.logger.warning("outbound queue of %s_%s full. disconnect websocket", self.channel_name, self.user_id)
+                self.closed = True
+                self.close_task = asyncio.create_task(self.close(code=1013))
+                return False
+            case _:
+                self.drop(1)
+                return True
+
+    def drop(self, count: int):
+        for _ in range(count):
+            self.queue.popleft()
+        self.dropped_messages += count
+        websocket_outbound_queue_depth.dec(count)
+        websocket_dropped_messages.labels(policy=self.overflow_policy).inc(count)
+
+    async def writer(self):
+        try:
+            while True:
+                if not self.queue:
+                    self.message_available.clear()
+                    await self.message_available.wait()
+                    continue
+
+                enqueued_at, message, trace_fields = self.queue.popleft()
+                websocket_outbound_queue_depth.dec()
+
+                with start_span("websocket send", trace_fields, user_id=self.user_id):
+                    await self.websocket.send_text(message)
+
+                self.last_lag = time.monotonic() - enqueued_at
+                self.max_lag = max(self.max_lag, self.last_lag)
+                self.sent_messages += 1
+                websocket_send_lag.observe(self.last_lag)
+
+                produced_at = get_produced_at(trace_fields) if trace_fields else None
+                if produced_at is not None:
+                    item_delivery_latency.labels(stage="websocket").observe(max(0.0, time.time() - produced_at))
+
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.logger.warning("websocket writer of %s_%s stopped: %s", self.channel_name, self.user_id, e)
+        finally:
+            self.clear_queue()
+
+    def clear_queue(self):
+        # auch aus `stop`: ein vor dem ersten Durchlauf abgebrochener Writer Task führt sein finally nie aus
+        self.closed = True
+        websocket_outbound_queue_depth.dec(len(self.queue))
+        self.queue.clear()
+
+    async def close(self, code: int = 1000):
+        self.stop()
+        try:
+            await self.websocket.close(code=code)
+        except Exception as e:
+            self.logger.debug("websocket of %s_%s already closed: %s", self.channel_name, self.user_id, e)
+
+    def stop(self):
+        if self.writer_task:
+            self.writer_task.cancel()
+            self.writer_task = None
+        self.clear_queue()
@@ -0,0 +1,81 @@
+"""
+Benchmark: Cache-Invalidierung per KEYS-Scan vs. Generationszähler.
+
+Benötigt einen laufenden Redis (REDIS_HOST, Standard: localhost). Es wird die separate
+Datenbank BENCHMARK_REDIS_DB (Standard: 15) verwendet und geleert.
+
+    cd backend
+    python -m benchmark.bench_cache_invalidation
+"""
+import asyncio
+import os
+import statistics
+import time
+
+from redis.asyncio import Redis
+
+COLLECTION_ID = "benchmark_collection"
+VARIANT_COUNTS = [10, 100, 1_000, 10_000, 50_000]
+WRITES = 50
+REDIS_DB = int(os.getenv("BENCHMARK_REDIS_DB", "15"))
+
+
+async def fill_cache(redis: Redis, variants: int, generation: int = 0):
+    async with redis.pipeline(transaction=False) as pipe:
+        for i in range(variants):
+            pipe.set(f"collection_cache:{COLLECTION_ID}:{generation}:label=red:price=asc:{i}:50", "{}", ex=300)
+        await pipe.execute()
+
+
+async def keys_invalidation(redis: Redis):
+    keys = await redis.keys(f"collection_cache:{COLLECTION_ID}*")
+    if keys:
+        await redis.delete(*keys)
+
+
+async def generation_invalidation(redis: Redis):
+    generation_key = f"collection_generation:{COLLECTION_ID}"
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set(generation_key, time.time_ns(), nx=True)
+        pipe.incr(generation_key)
+        await pipe.execute()
+
+
+async def measure(redis: Redis, variants: int, invalidate) -> list[float]:
+    durations = []
+    await fill_cache(redis, variants)
+
+    for _ in range(WRITES):
+        start = time.perf_counter()
+        await invalidate(redis)
+        durations.append((time.perf_counter() - start) * 1000)
+        if invalidate is keys_invalidation:
+            # der KEYS-Scan muss bei jedem Schreibvorgang wieder alle Varianten vorfinden
+            await fill_cache(redis, variants)
+    return durations
+
+
+def report(name: str, variants: int, durations: list[float]):
+    durations = sorted(durations)
+    p50 = statistics.median(durations)
+    p99 = durations[int(len(durations) * 0.99) - 1]
+    print(f"{name:<12} variants={variants:>6}  p50={p50:8.3f} ms  p99={p99:8.3f} ms")
+
+
+async def main():
+    redis = Redis(host=os.getenv("REDIS_HOST", "localhost"), port=6379, db=REDIS_DB, decode_responses=True)
+
+    try:
+        for variants in VARIANT_COUNTS:
+            await redis.flushdb()
+            report("keys", variants, await measure(redis, variants, keys_invalidation))
+
+            await redis.flushdb()
+            report("generation", variants, await measure(redis, variants, generation_invalidation))
+    finally:
+        await redis.flushdb()
+        await redis.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
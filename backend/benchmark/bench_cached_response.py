@@ -0,0 +1,59 @@
+"""
+Micro-Benchmark: Cache-Treffer in `get_items` mit JSON round-trip vs. vorserialisierte Bytes.
+
+alt: json.loads -> dict merge -> jsonable_encoder -> JSONResponse.render
+neu: splice_source -> CachedJSONResponse.render
+
+    cd backend
+    python -m benchmark.bench_cached_response
+"""
+import json
+import statistics
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.collections.cache_response import CachedJSONResponse, dump_json, splice_source
+
+ITEM_COUNTS = [1_000, 10_000]
+REPEAT = 20
+
+
+def create_payload(item_count: int) -> str:
+    data = [
+        {
+            "id": f"{i:024x}",
+            "name": f"item {i}",
+            "description": "test item",
+            "label": "red" if i % 2 else "green",
+            "price": i * 0.5,
+            "checked": bool(i % 3),
+        }
+        for i in range(item_count)
+    ]
+    return dump_json({"name": "benchmark_collection", "data": data}).decode("utf-8")
+
+
+def current_path(cached_data: str) -> bytes:
+    content = {"source": "cache"} | json.loads(cached_data)
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def raw_bytes_path(cached_data: str) -> bytes:
+    return CachedJSONResponse(splice_source(cached_data.encode("utf-8"), "cache")).body
+
+
+def main():
+    for item_count in ITEM_COUNTS:
+        cached_data = create_payload(item_count)
+        assert json.loads(current_path(cached_data)) == json.loads(raw_bytes_path(cached_data))
+
+        for name, function in [("json round-trip", current_path), ("raw bytes", raw_bytes_path)]:
+            timings = timeit.repeat(lambda: function(cached_data), number=1, repeat=REPEAT)
+            median_ms = statistics.median(timings) * 1000
+            print(f"{name:<16} items={item_count:>6}  median={median_ms:9.3f} ms  min={min(timings) * 1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
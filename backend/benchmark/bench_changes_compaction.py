@@ -0,0 +1,95 @@
+"""
+Benchmark: `get_changes` mit history=false in Python vs. als Aggregation in MongoDB.
+
+Benötigt einen laufenden MongoDB (MONGO_URI, Standard: mongodb://localhost:27017/?directConnection=true).
+Die Events werden in der Datenbank BENCHMARK_MONGO_DATABASE (Standard: benchmark) erzeugt und danach gelöscht.
+
+    cd backend
+    python -m benchmark.bench_changes_compaction
+"""
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.collections.collection_changes import group_and_sort_changes, remove_not_important_changes, \
+    build_compact_changes_pipeline
+
+EVENT_COUNTS = [10_000, 100_000, 1_000_000]
+EVENTS_PER_ITEM = 5
+BATCH_SIZE = 10_000
+
+
+def create_events(event_count: int):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    random.seed(event_count)
+
+    for item_index in range(event_count // EVENTS_PER_ITEM):
+        item_id = ObjectId()
+        actions = ["created"] + ["edited"] * (EVENTS_PER_ITEM - 2) + [random.choice(["edited", "removed"])]
+
+        for i, event in enumerate(actions):
+            timestamp = start + timedelta(seconds=item_index, milliseconds=i)
+            yield {
+                "event": event,
+                "item": {"_id": item_id, "name": f"item {item_index}", "label": "red", "edit": i},
+                "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            }
+
+
+def convert_ids(data):
+    for item in data:
+        item["item"]["id"] = str(item["item"]["_id"])
+        del item["_id"]
+        del item["item"]["_id"]
+    return data
+
+
+async def python_compaction(collection):
+    data = convert_ids(await collection.find({}).to_list(length=None))
+    return remove_not_important_changes(group_and_sort_changes(data))
+
+
+async def aggregation_compaction(collection):
+    cursor = collection.aggregate(build_compact_changes_pipeline({}), allowDiskUse=True)
+    return convert_ids(await cursor.to_list(length=None))
+
+
+async def main():
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/?directConnection=true"))
+    db = client[os.getenv("BENCHMARK_MONGO_DATABASE", "benchmark")]
+    collection = db["benchmark_events"]
+
+    try:
+        for event_count in EVENT_COUNTS:
+            await collection.drop()
+            await collection.create_index("timestamp")
+
+            batch = []
+            for event in create_events(event_count):
+                batch.append(event)
+                if len(batch) == BATCH_SIZE:
+                    await collection.insert_many(batch, ordered=False)
+                    batch = []
+            if batch:
+                await collection.insert_many(batch, ordered=False)
+
+            results = {}
+            for name, function in [("python", python_compaction), ("aggregation", aggregation_compaction)]:
+                start = time.perf_counter()
+                results[name] = await function(collection)
+                duration = time.perf_counter() - start
+                print(f"{name:<12} events={event_count:>8}  result={len(results[name]):>7}  duration={duration * 1000:10.1f} ms")
+
+            assert results["python"] == results["aggregation"]
+    finally:
+        await collection.drop()
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+"""
+Benchmark: Durchsatz von `parse_filter_string` ohne und mit gecachtem Query-Plan.
+
+    cd backend
+    python -m benchmark.bench_filter_parse
+"""
+import time
+
+from app.collections.collection_filter import parse_filter_string, compile_query_plan
+
+FILTER_STRINGS = [
+    "name=Apfel",
+    "price>2,price<7,checked=false",
+    "label=[red,green,blue],name^=Ap,price=2..7.5",
+    'note="a, b",timestamp>2025-05-10T13:35:39.877988Z,label!=[grey]',
+]
+ITERATIONS = 100_000
+
+
+def measure(filter_string: str, cold: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        if cold:
+            compile_query_plan.cache_clear()
+        parse_filter_string(filter_string)
+    return time.perf_counter() - start
+
+
+def main():
+    for filter_string in FILTER_STRINGS:
+        cold = measure(filter_string, cold=True)
+        cached = measure(filter_string, cold=False)
+        print(f"{filter_string[:60]:<60}  cold={ITERATIONS / cold:>10.0f}/s  cached={ITERATIONS / cached:>10.0f}/s  "
+              f"speedup={cold / cached:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
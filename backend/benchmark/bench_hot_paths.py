@@ -0,0 +1,209 @@
+"""
+Micro-Benchmark der reinen Python-Pfade, die bei jedem Request laufen, mit Baseline und Regressions-Grenze:
+`parse_filter_string`, `group_and_sort_changes`, `remove_not_important_changes` sowie `convert_item_id`
+und `convert_event_id` aus `get_items`/`get_changes`, jeweils für 100 bis 1.000.000 synthetische Datensätze.
+
+Pro Runde werden die Daten außerhalb der Zeitmessung neu erzeugt (die Konvertierungen ändern sie),
+kleine Größen werden in einer Runde mehrfach ausgeführt. Verglichen wird das Minimum der Runden,
+es schwankt am wenigsten. Die Baseline gilt nur für den Rechner, auf dem sie erstellt wurde.
+
+    cd backend
+    python -m benchmark.bench_hot_paths --save benchmark/baseline_hot_paths.json
+    python -m benchmark.bench_hot_paths --compare benchmark/baseline_hot_paths.json --threshold 10
+    python -m benchmark.bench_hot_paths --sizes 100,10000 --only group_and_sort_changes
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Tuple
+
+from bson import ObjectId
+
+from app.collections.collection_filter import parse_filter_string, compile_query_plan
+from app.collections.collection_changes import group_and_sort_changes, remove_not_important_changes
+from app.routers.collections_item_get_methods import convert_item_id, convert_event_id
+
+SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+ROUNDS = int(os.getenv("BENCHMARK_ROUNDS", "3"))
+# kleine Größen so oft wiederholen, dass eine Runde mindestens so viele Datensätze verarbeitet
+RECORDS_PER_ROUND = int(os.getenv("BENCHMARK_RECORDS_PER_ROUND", "100000"))
+REGRESSION_THRESHOLD = float(os.getenv("BENCHMARK_REGRESSION_THRESHOLD", "10"))
+EVENTS_PER_ITEM = 4
+LABELS = ["red", "green", "blue", "grey"]
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+# ------------------- synthetische Daten -------------------
+
+def create_filter_strings(size: int) -> List[str]:
+    # verschiedene Werte, damit jeder String einmal geparst und nicht nur aus dem Cache gelesen wird
+    templates = [
+        "name=item {i}",
+        "price>{i},price<{j},checked=false",
+        "label=[red,green,blue],name^=it{i},price={i}..{j}.5",
+        'note="a, {i}",timestamp>2025-05-10T13:35:39.877988Z,label!=[grey]',
+    ]
+    return [templates[i % len(templates)].format(i=i, j=i + 5) for i in range(size)]
+
+
+def create_items(size: int) -> List[Dict]:
+    return [
+        {"_id": ObjectId(), "name": f"item {i}", "label": LABELS[i % len(LABELS)], "price": i % 10, "seq": i}
+        for i in range(size)
+    ]
+
+
+def create_events(size: int) -> List[Dict]:
+    events = []
+    item_id = None
+    for i in range(size):
+        if i % EVENTS_PER_ITEM == 0:
+            item_id = ObjectId()
+            event = "created"
+        elif i % EVENTS_PER_ITEM == EVENTS_PER_ITEM - 1 and i % 3 == 0:
+            event = "removed"
+        else:
+            event = "edited"
+
+        events.append({
+            "_id": ObjectId(),
+            "event": event,
+            "item": {"_id": item_id, "name": f"item {i // EVENTS_PER_ITEM}", "label": LABELS[i % len(LABELS)]},
+            "timestamp": (START + timedelta(milliseconds=i)).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        })
+    return events
+
+
+def create_converted_events(size: int) -> List[Dict]:
+    return [convert_event_id(event) for event in create_events(size)]
+
+
+def create_grouped_events(size: int) -> Dict:
+    return group_and_sort_changes(create_converted_events(size))
+
+
+# ------------------- Benchmarks -------------------
+
+def parse_filters(filter_strings: List[str]):
+    compile_query_plan.cache_clear()
+    for filter_string in filter_strings:
+        parse_filter_string(filter_string)
+
+
+def convert_items(items: List[Dict]):
+    for item in items:
+        convert_item_id(item)
+
+
+def convert_events(events: List[Dict]):
+    for event in events:
+        convert_event_id(event)
+
+
+# Name -> (Daten für eine Größe erzeugen, gemessene Funktion)
+BENCHMARKS: Dict[str, Tuple[Callable[[int], object], Callable[[object], object]]] = {
+    "parse_filter_string": (create_filter_strings, parse_filters),
+    "group_and_sort_changes": (create_converted_events, group_and_sort_changes),
+    "remove_not_important_changes": (create_grouped_events, remove_not_important_changes),
+    "convert_item_id": (create_items, convert_items),
+    "convert_event_id": (create_events, convert_events),
+}
+
+
+def measure(create_data: Callable[[int], object], function: Callable[[object], object], size: int, rounds: int) -> Dict:
+    iterations = max(1, RECORDS_PER_ROUND // size)
+    durations = []
+
+    for _ in range(rounds):
+        data = [create_data(size) for _ in range(iterations)]
+
+        start = time.perf_counter()
+        for data_of_iteration in data:
+            function(data_of_iteration)
+        durations.append((time.perf_counter() - start) / iterations)
+
+    return {
+        "size": size,
+        "rounds": rounds,
+        "iterations": iterations,
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.mean(durations),
+    }
+
+
+def run(names: List[str], sizes: List[int], rounds: int) -> Dict:
+    results = {}
+    for name in names:
+        create_data, function = BENCHMARKS[name]
+        for size in sizes:
+            key = f"{name}[{size}]"
+            results[key] = measure(create_data, function, size, rounds)
+            result = results[key]
+            print(f"{key:<40} min={result['min'] * 1000:10.3f} ms  median={result['median'] * 1000:10.3f} ms  "
+                  f"per record={result['min'] / size * 1e9:8.1f} ns")
+
+    return {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor()},
+        "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        "benchmarks": results,
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Gibt die Benchmarks zurück, deren Minimum um mehr als `threshold` Prozent über der Baseline liegt."""
+    regressions = []
+    for key, result in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(key)
+        if previous is None:
+            print(f"{key:<40} not in baseline")
+            continue
+
+        change = (result["min"] / previous["min"] - 1) * 100
+        regressed = change > threshold
+        print(f"{key:<40} baseline={previous['min'] * 1000:10.3f} ms  now={result['min'] * 1000:10.3f} ms  "
+              f"{change:+7.1f} %{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(key)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="Anzahl Datensätze, kommagetrennt")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="Benchmarks, kommagetrennt")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--save", help="Ergebnisse als Baseline speichern")
+    parser.add_argument("--compare", help="Baseline, mit der verglichen wird")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="erlaubte Verschlechterung in Prozent")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = run(names, [int(size) for size in args.sizes.split(",")], args.rounds)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed by more than {args.threshold} %: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
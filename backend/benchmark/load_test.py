@@ -0,0 +1,346 @@
+"""
+Lasttest: startet die FastAPI `app` im Prozess (uvicorn auf einem freien Port) und misst Durchsatz und
+p50/p95/p99 pro Endpunkt für eine Mischung aus Item-CRUD, `get_items` mit Filtern, `get_changes`
+und Websocket-Abonnenten. Der Outbox Publisher läuft im selben Event Loop mit.
+
+Ohne laufende Dienste: mit --spawn werden `mongod` und `redis-server` (müssen im PATH liegen) auf freien
+Ports in einem temporären Verzeichnis gestartet und danach wieder entfernt. Sonst werden MONGO_URI,
+REDIS_HOST und REDIS_PORT verwendet, die Daten liegen in BENCHMARK_MONGO_DATABASE (Standard: benchmark).
+MongoDB muss dann als Replica Set laufen (oder OUTBOX_TRANSACTIONS=0 für ein einzelnes mongod).
+
+    cd backend
+    python -m benchmark.load_test --spawn --duration 30 --output results.json
+    python -m benchmark.load_test --spawn --duration 30 --compare results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Anteil der Operationen an der Last
+OPERATION_WEIGHTS = {
+    "create_item": 15,
+    "update_item": 15,
+    "delete_item": 5,
+    "get_items": 25,
+    "get_items_filtered": 25,
+    "get_changes": 15,
+}
+FILTERS = ["label=red", "price>2,price<7", "label=[red,green],name^=item", "checked=false"]
+SORTS = ["", "price=asc", "name=desc,price=asc"]
+LABELS = ["red", "green", "blue"]
+PASSWORD = "benchmark_password"
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"port {port} not reachable after {timeout} s")
+            await asyncio.sleep(0.1)
+
+
+class LocalServices:
+    """mongod und redis-server als Kindprozesse, nur für die Dauer des Benchmarks."""
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix="einkaufsliste_benchmark_")
+        self.processes: List[subprocess.Popen] = []
+
+    async def start(self):
+        for binary in ("mongod", "redis-server"):
+            if shutil.which(binary) is None:
+                raise SystemExit(f"{binary} not found in PATH (start without --spawn to use MONGO_URI and REDIS_HOST)")
+
+        mongo_port, redis_port = get_free_port(), get_free_port()
+        os.makedirs(os.path.join(self.directory, "db"))
+
+        self.processes.append(subprocess.Popen(
+            ["mongod", "--dbpath", os.path.join(self.directory, "db"), "--port", str(mongo_port), "--bind_ip", "127.0.0.1",
+             "--replSet", "rs0", "--logpath", os.path.join(self.directory, "mongod.log"), "--quiet"],
+            stdout=subprocess.DEVNULL,
+        ))
+        self.processes.append(subprocess.Popen(
+            ["redis-server", "--port", str(redis_port), "--save", "", "--appendonly", "no", "--dir", self.directory],
+            stdout=subprocess.DEVNULL,
+        ))
+
+        await wait_for_port(mongo_port)
+        await wait_for_port(redis_port)
+
+        # Item-Änderungen laufen in Transaktionen, dafür braucht es ein (Single-Node) Replica Set
+        os.environ["MONGO_URI"] = f"mongodb://127.0.0.1:{mongo_port}/?directConnection=true"
+        await self.initiate_replica_set(os.environ["MONGO_URI"], mongo_port)
+        os.environ["REDIS_HOST"] = "127.0.0.1"
+        os.environ["REDIS_PORT"] = str(redis_port)
+
+    async def initiate_replica_set(self, uri: str, port: int, timeout: float = 30):
+        client = AsyncIOMotorClient(uri)
+        try:
+            await client.admin.command("replSetInitiate", {"_id": "rs0", "members": [{"_id": 0, "host": f"127.0.0.1:{port}"}]})
+
+            deadline = time.monotonic() + timeout
+            while not (await client.admin.command("hello")).get("isWritablePrimary"):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"replica set not ready after {timeout} s")
+                await asyncio.sleep(0.2)
+        finally:
+            client.close()
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=30)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {name: [] for name in OPERATION_WEIGHTS}
+        self.errors: Dict[str, int] = {name: 0 for name in OPERATION_WEIGHTS}
+
+    def record(self, name: str, duration: float, ok: bool):
+        self.latencies[name].append(duration)
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self, duration: float) -> Dict[str, Dict]:
+        endpoints = {}
+        for name, latencies in self.latencies.items():
+            if len(latencies) < 2:
+                continue
+            percentiles = statistics.quantiles(latencies, n=100)
+            endpoints[name] = {
+                "requests": len(latencies),
+                "errors": self.errors[name],
+                "throughput": len(latencies) / duration,
+                "p50_ms": percentiles[49] * 1000,
+                "p95_ms": percentiles[94] * 1000,
+                "p99_ms": percentiles[98] * 1000,
+            }
+        return endpoints
+
+
+def create_item(index: int) -> Dict:
+    return {"name": f"item {index}", "description": "benchmark item", "label": LABELS[index % len(LABELS)],
+            "price": index % 10, "checked": index % 2 == 0}
+
+
+async def sign_up(client: httpx.AsyncClient, username: str) -> Dict[str, str]:
+    data = {"username": username, "fullname": username, "email": f"{username}@example.com", "password": PASSWORD,
+            "admin_key": os.getenv("ADMIN_KEY", "1234")}
+    response = await client.post("/user/sign_up", data=data)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_client(client: httpx.AsyncClient, headers: Dict, collection_id: str, item_ids: List[str],
+                     recorder: Recorder, deadline: float, rng: random.Random):
+    names, weights = list(OPERATION_WEIGHTS), list(OPERATION_WEIGHTS.values())
+    base = f"/collections/{collection_id}"
+
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        if name in ("update_item", "delete_item") and not item_ids:
+            name = "create_item"
+
+        start = time.perf_counter()
+        match name:
+            case "create_item":
+                response = await client.post(f"{base}/item", json=create_item(rng.randrange(1000)), headers=headers)
+                if response.is_success:
+                    item_ids.append(response.json()["id"])
+            case "update_item":
+                item_id = rng.choice(item_ids)
+                response = await client.put(f"{base}/item/{item_id}", json=create_item(rng.randrange(1000)), headers=headers)
+            case "delete_item":
+                item_id = item_ids.pop(rng.randrange(len(item_ids)))
+                response = await client.delete(f"{base}/item/{item_id}", headers=headers)
+            case "get_items":
+                response = await client.get(f"{base}/items", params={"sort": rng.choice(SORTS)}, headers=headers)
+            case "get_items_filtered":
+                response = await client.get(f"{base}/items", params={"filter": rng.choice(FILTERS), "limit": "50"}, headers=headers)
+            case _:
+                response = await client.get(f"{base}/changes", params={"history": rng.choice(["true", "false"])}, headers=headers)
+
+        # 404 nach einem parallelen Löschen desselben Items ist kein Fehler des Servers
+        recorder.record(name, time.perf_counter() - start, response.is_success or response.status_code == 404)
+
+
+async def run_subscriber(port: int, headers: Dict, collection_id: str, received: List[int], stop: asyncio.Event):
+    from websockets.asyncio.client import connect
+
+    async with connect(f"ws://127.0.0.1:{port}/sockets/connect/{collection_id}", additional_headers=headers) as websocket:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(websocket.recv(), timeout=0.5)
+                received[0] += 1
+            except asyncio.TimeoutError:
+                continue
+
+
+async def run_benchmark(args) -> Dict:
+    # erst nach dem Setzen der Umgebung importieren, die Module lesen ihre Konfiguration beim Import
+    import uvicorn
+    from prometheus_client import REGISTRY
+    from app.main import app, database_manager, connectionManager, collectionCache
+    from app.plugins.outbox_publisher_service import OutboxPublisherService
+
+    await database_manager.init()
+    await connectionManager.init(database_manager)
+    await collectionCache.init(database_manager.redis_client)
+
+    port = get_free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    server_task = asyncio.create_task(server.serve())
+    publisher_task = asyncio.create_task(OutboxPublisherService().run())
+    await wait_for_port(port)
+
+    rng = random.Random(args.seed)
+    run_id = f"{int(time.time())}_{rng.randrange(10_000)}"
+    recorder = Recorder()
+    stop_subscribers = asyncio.Event()
+    received = [0]
+
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        headers = await sign_up(client, f"benchmark_owner_{run_id}")
+        response = await client.post(f"/collections/create/benchmark_{run_id}/shopping", headers=headers)
+        response.raise_for_status()
+        collection_id = response.json()["id"]
+
+        operations = [{"op": "create", "item": create_item(i)} for i in range(args.items)]
+        item_ids = []
+        for i in range(0, len(operations), 500):
+            response = await client.post(f"/collections/{collection_id}/items/bulk", json=operations[i:i + 500], headers=headers)
+            response.raise_for_status()
+            item_ids += response.json()["ids"]
+
+        subscriber_tasks = []
+        for i in range(args.subscribers):
+            subscriber = f"benchmark_subscriber_{run_id}_{i}"
+            subscriber_headers = await sign_up(client, subscriber)
+            await client.patch(f"/collections/{collection_id}/users/add/{subscriber}", headers=headers)
+            subscriber_tasks.append(asyncio.create_task(run_subscriber(port, subscriber_headers, collection_id, received, stop_subscribers)))
+        await asyncio.sleep(1)
+
+        delivered_before = REGISTRY.get_sample_value("item_delivery_latency_seconds_count", {"stage": "websocket"}) or 0.0
+        delivery_sum_before = REGISTRY.get_sample_value("item_delivery_latency_seconds_sum", {"stage": "websocket"}) or 0.0
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            run_client(client, headers, collection_id, item_ids, recorder, deadline, random.Random(rng.random()))
+            for _ in range(args.concurrency)
+        ))
+        duration = time.perf_counter() - start
+
+        # Nachrichten aus der Outbox noch ausliefern lassen
+        await asyncio.sleep(1)
+        stop_subscribers.set()
+        await asyncio.gather(*subscriber_tasks, return_exceptions=True)
+
+        delivered = (REGISTRY.get_sample_value("item_delivery_latency_seconds_count", {"stage": "websocket"}) or 0.0) - delivered_before
+        delivery_sum = (REGISTRY.get_sample_value("item_delivery_latency_seconds_sum", {"stage": "websocket"}) or 0.0) - delivery_sum_before
+
+        await client.delete(f"/collections/{collection_id}", headers=headers)
+
+    publisher_task.cancel()
+    server.should_exit = True
+    await server_task
+    await collectionCache.shutdown()
+    await database_manager.mongo_client.drop_database(database_manager.mongo_db)
+    await database_manager.shutdown()
+
+    return {
+        "config": {"duration": args.duration, "concurrency": args.concurrency, "subscribers": args.subscribers,
+                   "items": args.items, "seed": args.seed},
+        "duration": duration,
+        "endpoints": recorder.summary(duration),
+        "websocket": {
+            "received": received[0],
+            "throughput": received[0] / duration,
+            "delivery_latency_mean_ms": delivery_sum / delivered * 1000 if delivered else None,
+        },
+    }
+
+
+def print_results(results: Dict, baseline: Optional[Dict] = None):
+    print(f"{'endpoint':<20} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, endpoint in results["endpoints"].items():
+        line = (f"{name:<20} {endpoint['throughput']:>9.1f} {endpoint['p50_ms']:>9.2f} {endpoint['p95_ms']:>9.2f} "
+                f"{endpoint['p99_ms']:>9.2f} {endpoint['errors']:>7}")
+        previous = (baseline or {}).get("endpoints", {}).get(name)
+        if previous:
+            line += (f"   p95 {(endpoint['p95_ms'] / previous['p95_ms'] - 1) * 100:+6.1f} %"
+                     f"  req/s {(endpoint['throughput'] / previous['throughput'] - 1) * 100:+6.1f} %")
+        print(line)
+
+    websocket = results["websocket"]
+    latency = websocket["delivery_latency_mean_ms"]
+    print(f"websocket: {websocket['received']} messages ({websocket['throughput']:.1f}/s), "
+          f"delivery latency mean {'-' if latency is None else f'{latency:.1f} ms'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spawn", action="store_true", help="mongod und redis-server lokal starten")
+    parser.add_argument("--duration", type=float, default=30, help="Dauer der Last in Sekunden")
+    parser.add_argument("--concurrency", type=int, default=20, help="parallele HTTP Clients")
+    parser.add_argument("--subscribers", type=int, default=5, help="Websocket-Abonnenten der Collection")
+    parser.add_argument("--items", type=int, default=1000, help="Items in der Collection vor dem Start")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Ergebnisse als JSON speichern")
+    parser.add_argument("--compare", help="JSON eines früheren Laufs zum Vergleich")
+    args = parser.parse_args()
+
+    # eigene Datenbank, sie wird am Ende gelöscht
+    os.environ["MONGO_DATABASE"] = os.getenv("BENCHMARK_MONGO_DATABASE", "benchmark")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    services = LocalServices() if args.spawn else None
+    try:
+        if services:
+            asyncio.run(services.start())
+        results = asyncio.run(run_benchmark(args))
+    finally:
+        if services:
+            services.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
 #!/bin/bash
 
+# Prometheus Multiprocess-Modus: Worker und service_loader schreiben in ein gemeinsames Verzeichnis
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}"
+# ältere prometheus_client Versionen lesen nur den kleingeschriebenen Namen
+export prometheus_multiproc_dir="$PROMETHEUS_MULTIPROC_DIR"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 if [ "$DEBUG" = "1" ]; then
   echo "🔧 Starte im Debug-Modus..."
   python3 -m app.service_loader &
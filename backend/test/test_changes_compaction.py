@@ -0,0 +1,90 @@
+import time
+from datetime import datetime, UTC
+
+import pytest
+import requests
+from fastapi import status
+
+from app.collections.collection_changes import group_and_sort_changes, remove_not_important_changes
+
+from .test_base import TestBase, url, all_items
+
+
+# Aktionen pro Item: c = create, e = edit, r = remove
+scenarios = [
+    ["c"],
+    ["c", "e"],
+    ["c", "e", "e"],
+    ["c", "r"],
+    ["c", "e", "r"],
+    ["c", "e", "e", "r"],
+]
+
+
+class TestChangesCompactionEquivalence(TestBase):
+    """Die Verdichtung in MongoDB (history=false) muss das gleiche Ergebnis liefern wie die Python-Implementierung."""
+
+    def apply_actions(self, collection_id: str, headers, item, actions: list[str]):
+        response = requests.post(f"{url}/collections/{collection_id}/item", headers=headers, json=item)
+        item_id = response.json()["id"]
+
+        for i, action in enumerate(actions[1:]):
+            if action == "e":
+                requests.put(f"{url}/collections/{collection_id}/item/{item_id}", headers=headers, json={"name": f"edit_{i}"})
+            elif action == "r":
+                requests.delete(f"{url}/collections/{collection_id}/item/{item_id}", headers=headers)
+
+    def assert_equivalent(self, collection_id: str, headers, filter_string: str = ""):
+        response = requests.get(f"{url}/collections/{collection_id}/changes?filter={filter_string}&history=true", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        expected = remove_not_important_changes(group_and_sort_changes(response.json()["data"]))
+
+        response = requests.get(f"{url}/collections/{collection_id}/changes?filter={filter_string}&history=false", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+
+        assert response.json()["data"] == expected
+
+    @pytest.mark.parametrize("actions", scenarios)
+    def test_compaction_single_item(self, actions):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        # when
+        self.apply_actions(collection_id, headers, all_items[0], actions)
+
+        # then
+        self.assert_equivalent(collection_id, headers)
+
+    def test_compaction_mixed_items(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        # when
+        for i, actions in enumerate(scenarios):
+            self.apply_actions(collection_id, headers, all_items[i % len(all_items)], actions)
+
+        # then
+        self.assert_equivalent(collection_id, headers)
+
+    def test_compaction_with_timestamp_filter(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        for i, actions in enumerate(scenarios[:3]):
+            self.apply_actions(collection_id, headers, all_items[i], actions)
+
+        time.sleep(0.1)
+        timestamp = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+        # when
+        for i, actions in enumerate(scenarios[3:]):
+            self.apply_actions(collection_id, headers, all_items[i], actions)
+
+        # then
+        self.assert_equivalent(collection_id, headers, f"timestamp>{timestamp}")
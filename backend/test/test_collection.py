@@ -32,6 +32,9 @@ class TestCollectionAPI(TestBase):
         assert response.status_code == status.HTTP_200_OK
         assert response.json()["source"] == "db"
         assert response.json()["data"] != None
+        # interne Felder werden nicht ausgeliefert
+        assert "seq" not in response.json()["data"]
+        assert "pending_seq" not in response.json()["data"]
 
     def test_rename_collection(self):
         # given
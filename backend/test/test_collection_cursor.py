@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId, Decimal128
+from pymongo import ASCENDING, DESCENDING
+
+from app.collections.collection_cursor import build_sort_spec, encode_cursor, decode_cursor, build_keyset_filter, \
+    build_after_condition
+
+item_id = ObjectId()
+
+
+class TestCollectionCursor:
+
+    def test_cursor_keeps_bson_types(self):
+        sort_spec = build_sort_spec({"timestamp": ASCENDING, "price": DESCENDING})
+        item = {"_id": item_id, "timestamp": datetime(2025, 5, 10, 13, 35, 39, 877000), "price": Decimal128("2.50")}
+
+        values = decode_cursor(encode_cursor(item, sort_spec), sort_spec)
+
+        assert values == [item["timestamp"], item["price"], item_id]
+
+    def test_cursor_resolves_dotted_sort_fields(self):
+        sort_spec = build_sort_spec({"item.price": ASCENDING})
+
+        assert decode_cursor(encode_cursor({"_id": item_id, "item": {"price": 2}}, sort_spec), sort_spec) == [2, item_id]
+        assert decode_cursor(encode_cursor({"_id": item_id, "item": "text"}, sort_spec), sort_spec) == [None, item_id]
+
+    def test_cursor_keeps_type_of_id(self):
+        sort_spec = build_sort_spec({})
+
+        assert decode_cursor(encode_cursor({"_id": "custom_id"}, sort_spec), sort_spec) == ["custom_id"]
+        assert decode_cursor(encode_cursor({"_id": 7}, sort_spec), sort_spec) == [7]
+
+        # ältere Cursor ohne Format enthalten die ObjectId als String
+        legacy_cursor = base64.urlsafe_b64encode(json.dumps({"s": ["_id"], "v": [str(item_id)]}).encode()).decode().rstrip("=")
+        assert decode_cursor(legacy_cursor, sort_spec) == [item_id]
+
+    def test_missing_sort_field_is_null(self):
+        sort_spec = build_sort_spec({"price": ASCENDING})
+
+        assert decode_cursor(encode_cursor({"_id": item_id}, sort_spec), sort_spec) == [None, item_id]
+
+    def test_keyset_filter_ascending(self):
+        sort_spec = build_sort_spec({"price": ASCENDING})
+
+        assert build_keyset_filter(sort_spec, ["b", item_id])["$or"][0] == {"$or": [
+            {"price": {"$gt": "b"}},
+            {"price": {"$type": ["object", "array", "binData", "objectId", "bool", "date", "timestamp", "regex", "maxKey"]}},
+        ]}
+
+    def test_keyset_filter_after_null_ascending(self):
+        # null und fehlende Felder sortiert MongoDB zuerst, danach kommen alle Items mit Wert
+        sort_spec = build_sort_spec({"price": ASCENDING})
+
+        assert build_keyset_filter(sort_spec, [None, item_id])["$or"][0] == {"price": {"$ne": None}}
+
+    def test_keyset_filter_descending_includes_null(self):
+        sort_spec = build_sort_spec({"price": DESCENDING})
+
+        assert build_keyset_filter(sort_spec, ["b", item_id])["$or"][0] == {"$or": [
+            {"price": {"$lt": "b"}},
+            {"price": {"$type": ["minKey", "int", "long", "double", "decimal"]}},
+            {"price": None},
+        ]}
+
+    def test_keyset_filter_after_null_descending(self):
+        sort_spec = build_sort_spec({"price": DESCENDING})
+
+        assert build_keyset_filter(sort_spec, [None, item_id]) == {"price": None, "$or": [
+            {"_id": {"$gt": item_id}},
+            {"_id": {"$type": ["bool", "date", "timestamp", "regex", "maxKey"]}},
+        ]}
+
+    def test_mixed_types_ascending(self):
+        # $gt vergleicht nur gleiche Typen, Strings kommen in MongoDB nach allen Zahlen
+        condition = build_after_condition("price", ASCENDING, 2)
+
+        assert {"price": {"$gt": 2}} in condition["$or"]
+        assert "string" in condition["$or"][1]["price"]["$type"]
+        assert "int" not in condition["$or"][1]["price"]["$type"]
+
+    def test_mixed_types_descending(self):
+        # absteigend kommen nach einem Datum alle Zahlen, Strings, ObjectIds usw., aber keine Timestamps
+        condition = build_after_condition("timestamp", DESCENDING, datetime(2025, 5, 10))
+        types = condition["$or"][1]["timestamp"]["$type"]
+
+        assert {"int", "string", "objectId", "bool"} <= set(types)
+        assert "date" not in types and "timestamp" not in types
+        assert condition["$or"][2] == {"timestamp": None}
+
+    def test_bool_is_not_a_number(self):
+        condition = build_after_condition("checked", ASCENDING, False)
+
+        assert "int" not in condition["$or"][1]["checked"]["$type"]
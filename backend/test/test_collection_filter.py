@@ -0,0 +1,190 @@
+import random
+import string
+
+import pytest
+from fastapi import HTTPException, status
+from pymongo import ASCENDING, DESCENDING
+
+from app.collections.collection_filter import parse_filter_string, parse_sort_string, compile_query_plan, FilterParser
+
+iterations = 2000
+
+
+def legacy_parse_filter_string(filter_string: str):
+    """Bisherige Implementierung als Referenz für die Eigenschafts-Tests."""
+    OPERATORS = {">=": "$gte", "<=": "$lte", "!=": "$ne", ">": "$gt", "<": "$lt", "=": "$eq", ":": "$eq"}
+
+    filters = {}
+    if not filter_string:
+        return filters
+
+    for part in filter_string.split(","):
+        for symbol in sorted(OPERATORS.keys(), key=len, reverse=True):
+            if symbol in part:
+                field, value = part.split(symbol, 1)
+                field = field.strip()
+                value = value.strip()
+
+                lower_val = value.lower()
+                if lower_val == "true":
+                    value = True
+                elif lower_val == "false":
+                    value = False
+                elif lower_val == "asc":
+                    value = ASCENDING
+                elif lower_val == "desc":
+                    value = DESCENDING
+                else:
+                    try:
+                        value = float(value) if "." in value else int(value)
+                    except ValueError:
+                        pass
+
+                mongo_op = OPERATORS[symbol]
+                if field in filters:
+                    if isinstance(filters[field], dict):
+                        filters[field][mongo_op] = value
+                    else:
+                        filters[field] = {"$eq": filters[field], mongo_op: value}
+                else:
+                    filters[field] = value if mongo_op == "$eq" else {mongo_op: value}
+                break
+
+    return filters
+
+
+def random_field(rng: random.Random) -> str:
+    return rng.choice(["name", "label", "price", "item.name", "timestamp", "checked"])
+
+
+def random_value(rng: random.Random) -> str:
+    return rng.choice([
+        str(rng.randint(-1000, 1000)),
+        f"{rng.uniform(-100, 100):.3f}",
+        rng.choice(["true", "false", "asc", "desc", "True", "DESC"]),
+        "".join(rng.choice(string.ascii_letters + string.digits + "-_ .[]\"'") for _ in range(rng.randint(1, 12))).strip() or "x",
+        rng.choice(["Nudeln...", "a..b", "..", "1..x", "[Sale]", "[1]", '"x"', "'a'", "say \"hi\""]),
+        "2025-05-10T13:35:39.877988Z",
+    ])
+
+
+def is_new_syntax(operator: str, value: str) -> bool:
+    # Listen, Anführungszeichen und Zahlenbereiche gab es vorher nicht, ":" kennt sie weiterhin nicht
+    if operator == ":":
+        return False
+    if value[:1] in ("[", '"', "'"):
+        return True
+    if operator == "=" and ".." in value:
+        return bool(FilterParser(value).range_conditions("field", value))
+    return False
+
+
+def random_legacy_filter(rng: random.Random) -> str:
+    operators = [">=", "<=", "!=", ">", "<", "=", ":"]
+    count = rng.randint(1, 5)
+    parts = []
+    while len(parts) < count:
+        operator, value = rng.choice(operators), random_value(rng)
+        # Werte mit Komma teilt der alte Parser auf
+        if "," in value or is_new_syntax(operator, value):
+            continue
+        parts.append(f"{random_field(rng)}{operator}{value}")
+    return ",".join(parts)
+
+
+class TestCollectionFilter:
+
+    @pytest.mark.parametrize("filter_string,expected", [
+        ("", {}),
+        (None, {}),
+        ("price>2,price<7,name:Apfel", {"price": {"$gt": 2, "$lt": 7}, "name": "Apfel"}),
+        ("label=asc,name=desc", {"label": ASCENDING, "name": DESCENDING}),
+        ("checked=true", {"checked": True}),
+        ("timestamp>2025-05-10T13:35:39.877988Z", {"timestamp": {"$gt": "2025-05-10T13:35:39.877988Z"}}),
+        ("label=[red,green]", {"label": {"$in": ["red", "green"]}}),
+        ("label!=[red, 'gr,een']", {"label": {"$nin": ["red", "gr,een"]}}),
+        ("price=2..7.5", {"price": {"$gte": 2, "$lte": 7.5}}),
+        ("price=2..", {"price": {"$gte": 2}}),
+        ("timestamp=2025-05-10..2025-05-11", {"timestamp": {"$gte": "2025-05-10", "$lte": "2025-05-11"}}),
+        ("name=Nudeln...,label=a..b,a=..", {"name": "Nudeln...", "label": "a..b", "a": ".."}),
+        ('name:[Sale],price:2..7,note:"a"', {"name": "[Sale]", "price": "2..7", "note": '"a"'}),
+        ("name^=A.p", {"name": {"$regex": "^A\\.p"}}),
+        ("name~=^Ap+l", {"name": {"$regex": "^Ap+l"}}),
+        ('note="a, b",count="5"', {"note": "a, b", "count": "5"}),
+        ('note="say \\"hi\\""', {"note": 'say "hi"'}),
+        (" a = 1 ,, b = x ", {"a": 1, "b": "x"}),
+    ])
+    def test_parse_filter_string(self, filter_string, expected):
+        assert parse_filter_string(filter_string) == expected
+
+    @pytest.mark.parametrize("filter_string,position", [
+        ("name", 0),
+        ("=1", 0),
+        ("a=1,b", 4),
+        ('a="x', 2),
+        ("a=[1,2", 2),
+        ("a>[1]", 5),
+        ("a~=(", 4),
+    ])
+    def test_parse_filter_string_invalid(self, filter_string, position):
+        with pytest.raises(HTTPException) as e:
+            parse_filter_string(filter_string)
+
+        assert e.value.status_code == status.HTTP_400_BAD_REQUEST
+        assert e.value.detail["position"] == position
+        assert e.value.detail["filter"] == filter_string
+        assert e.value.detail["message"]
+
+    def test_parse_sort_string(self):
+        assert parse_sort_string("name=desc,price=asc") == {"name": DESCENDING, "price": ASCENDING}
+        assert parse_sort_string("price=-1") == {"price": DESCENDING}
+        assert parse_sort_string(None) == {}
+
+    @pytest.mark.parametrize("sort_string", ["price=foo", "price=2.5", "name=[a,b]", "price=true", "price>asc", "price=2"])
+    def test_parse_sort_string_invalid(self, sort_string):
+        with pytest.raises(HTTPException) as e:
+            parse_sort_string(sort_string)
+
+        assert e.value.status_code == status.HTTP_400_BAD_REQUEST
+        assert e.value.detail["sort"] == sort_string
+
+    def test_query_plan_is_cached_and_not_mutable(self):
+        filter_string = "price>2,label=[red,green]"
+
+        assert compile_query_plan(filter_string) is compile_query_plan(filter_string)
+
+        filters = parse_filter_string(filter_string)
+        filters["price"]["$lt"] = 7
+        filters["label"]["$in"].append("blue")
+
+        assert parse_filter_string(filter_string) == {"price": {"$gt": 2}, "label": {"$in": ["red", "green"]}}
+
+    def test_property_same_result_as_legacy_parser(self):
+        rng = random.Random(42)
+
+        for _ in range(iterations):
+            filter_string = random_legacy_filter(rng)
+            assert parse_filter_string(filter_string) == legacy_parse_filter_string(filter_string), filter_string
+
+    def test_property_quoted_values_round_trip(self):
+        rng = random.Random(43)
+
+        for _ in range(iterations):
+            value = "".join(rng.choice(string.printable) for _ in range(rng.randint(0, 20)))
+            escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+
+            assert parse_filter_string(f'name="{escaped}"') == {"name": value}
+
+    def test_fuzz_only_structured_errors(self):
+        rng = random.Random(44)
+        alphabet = string.ascii_letters + string.digits + " ,.=<>!:^~[]\"'\\-_()*+?"
+
+        for _ in range(iterations * 5):
+            filter_string = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 30)))
+
+            try:
+                result = parse_filter_string(filter_string)
+                assert isinstance(result, dict)
+            except HTTPException as e:
+                assert e.status_code == status.HTTP_400_BAD_REQUEST
+                assert 0 <= e.detail["position"] <= len(filter_string)
@@ -0,0 +1,69 @@
+from app.collections import helper_methods
+from app.collections.collection_storage import ScopedCollection
+
+
+class FakeCollection:
+    name = "items"
+
+    def aggregate(self, pipeline, **kwargs):
+        return pipeline
+
+
+class TestScopedCollection:
+
+    def test_scope_overrides_collection_id_of_filter(self):
+        collection = ScopedCollection(FakeCollection(), "list_1")
+
+        assert collection.scope({"label": "red", "collection_id": "list_2"}) == {"label": "red", "collection_id": "list_1"}
+        assert collection.scope(None) == {"collection_id": "list_1"}
+
+    def test_update_cannot_change_collection_id(self):
+        collection = ScopedCollection(FakeCollection(), "list_1")
+
+        update = collection.scope_update({"$set": {"name": "test_item", "collection_id": "list_2", "collection_id.x": 1}, "$unset": {"collection_id": ""}})
+        assert update == {"$set": {"name": "test_item"}, "$unset": {}}
+
+        request = collection.update_request({"_id": 1}, {"$set": {"collection_id": "list_2", "seq": 3}})
+        assert request._filter == {"_id": 1, "collection_id": "list_1"}
+        assert request._doc == {"$set": {"seq": 3}}
+
+    def test_scope_document_and_unscope(self):
+        collection = ScopedCollection(FakeCollection(), "list_1")
+        item = {"name": "test_item"}
+
+        assert collection.scope_document(item) == {"name": "test_item", "collection_id": "list_1"}
+        assert collection.unscope(item) == {"name": "test_item"}
+
+    def test_projection_hides_collection_id(self):
+        collection = ScopedCollection(FakeCollection(), "list_1")
+
+        assert collection.projection(None) == {"collection_id": 0}
+        assert collection.projection({"item._id": 1}) == {"item._id": 1}
+
+    def test_aggregate_is_scoped(self):
+        collection = ScopedCollection(FakeCollection(), "list_1")
+
+        pipeline = collection.aggregate([{"$match": {"event": "created"}}])
+
+        assert pipeline == [{"$match": {"collection_id": "list_1"}}, {"$match": {"event": "created"}}, {"$unset": "collection_id"}]
+
+    def test_without_scope_everything_is_passed_through(self):
+        collection = ScopedCollection(FakeCollection())
+        item = {"name": "test_item"}
+
+        assert collection.scope({"label": "red"}) == {"label": "red"}
+        assert collection.scope_document(item) == {"name": "test_item"}
+        assert collection.projection(None) is None
+        assert collection.scope_update({"$set": {"collection_id": "list_2"}}) == {"$set": {"collection_id": "list_2"}}
+        assert collection.aggregate([{"$match": {}}]) == [{"$match": {}}]
+        assert not collection.is_scoped
+
+    def test_storage_filter_during_migration(self, monkeypatch):
+        monkeypatch.setattr(helper_methods, "is_shared_storage", lambda: True)
+
+        # Schreibzugriffe passen nur, solange die Liste noch dort liegt, wo der Request sie gelesen hat
+        assert helper_methods.get_storage_filter(True) == {"storage": "shared"}
+        assert helper_methods.get_storage_filter(False) == {"storage": {"$exists": False}}
+
+        monkeypatch.setattr(helper_methods, "is_shared_storage", lambda: False)
+        assert helper_methods.get_storage_filter(False) == {}
@@ -3,7 +3,7 @@ from typing import Dict
 import requests
 from fastapi import status
 
-from .test_base import TestBase, url, test_item_1
+from .test_base import TestBase, url, test_item_1, test_item_2, test_item_3
 
 class TestEditItemsAPI(TestBase):
     def test_add_item_to_collection(self):
@@ -61,4 +61,78 @@ class TestEditItemsAPI(TestBase):
         assert response.status_code == status.HTTP_200_OK
         assert response.json()["message"] == "Item deleted"
 
-        self.assert_changes_event(collection_id, "removed", 1, headers, test_item_1)
\ No newline at end of file
+        self.assert_changes_event(collection_id, "removed", 1, headers, test_item_1)
+
+    def test_bulk_edit_items_in_collection(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+        response = requests.post(f"{url}/collections/{collection_id}/item", headers=headers, json=test_item_1)
+        item_id = response.json()["id"]
+        response = requests.post(f"{url}/collections/{collection_id}/item", headers=headers, json=test_item_2)
+        removed_item_id = response.json()["id"]
+
+        updated_item_data = test_item_1.copy()
+        updated_item_data["name"] = "new name"
+
+        operations = [
+            {"op": "create", "item": test_item_3},
+            {"op": "update", "id": item_id, "item": {"name": "new name"}},
+            {"op": "delete", "id": removed_item_id},
+        ]
+
+        # when
+        response = requests.post(f"{url}/collections/{collection_id}/items/bulk", headers=headers, json=operations)
+
+        # then
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["message"] == "Items changed"
+        assert len(response.json()["ids"]) == 3
+        assert response.json()["ids"][1:] == [item_id, removed_item_id]
+
+        self.assert_changes_event(collection_id, "created", 2, headers, test_item_3)
+        self.assert_changes_event(collection_id, "edited", 3, headers, updated_item_data)
+        self.assert_changes_event(collection_id, "removed", 4, headers, test_item_2)
+
+        response = requests.get(f"{url}/collections/{collection_id}/items", headers=headers)
+        assert len(response.json()["data"]) == 2
+
+    def test_bulk_edit_items_with_unknown_item(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        operations = [
+            {"op": "create", "item": test_item_1},
+            {"op": "delete", "id": "000000000000000000000000"},
+        ]
+
+        # when
+        response = requests.post(f"{url}/collections/{collection_id}/items/bulk", headers=headers, json=operations)
+
+        # then
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        response = requests.get(f"{url}/collections/{collection_id}/items", headers=headers)
+        assert len(response.json()["data"]) == 0
+
+    def test_bulk_edit_items_with_missing_fields(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        for operation in [{"op": "delete"}, {"op": "update", "item": {"name": "new name"}}, {"op": "create"}]:
+            # when
+            response = requests.post(f"{url}/collections/{collection_id}/items/bulk", headers=headers, json=[operation])
+
+            # then
+            assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        response = requests.get(f"{url}/collections/{collection_id}/items", headers=headers)
+        assert len(response.json()["data"]) == 0
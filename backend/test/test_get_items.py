@@ -1,3 +1,4 @@
+import json
 import time
 
 import pytest
@@ -131,4 +132,92 @@ class TestGetItemsAPI(TestBase):
 
         for i, expected_item in enumerate(expected_items):
             assert items[i]["name"] == expected_item["name"]
-            assert items[i]["description"] == expected_item["description"]
\ No newline at end of file
+            assert items[i]["description"] == expected_item["description"]
+
+    @pytest.mark.parametrize("items,filter_string,expected_items", [
+        (all_items, "", all_items),
+        (all_items, f"label={test_item_3['label']}", green_labeled_items),
+    ])
+    def test_get_collection_as_ndjson(self, items, filter_string, expected_items):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+
+        collection_id = response.json()["id"]
+
+        for item in items:
+            requests.post(f"{url}/collections/{collection_id}/item", headers=headers, json=item)
+
+        # when
+        response = requests.get(f"{url}/collections/{collection_id}/items?filter={filter_string}&format=ndjson", headers=headers, stream=True)
+
+        # then
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+        assert lines[0]["source"] == "db"
+        assert lines[0]["name"] == "test_collection"
+
+        streamed_items = lines[1:]
+        assert len(streamed_items) == len(expected_items)
+
+        for streamed_item, expected_item in zip(streamed_items, expected_items):
+            assert streamed_item["id"] is not None
+            assert streamed_item["name"] == expected_item["name"]
+
+    def test_get_collection_with_unknown_format(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        # when
+        response = requests.get(f"{url}/collections/{collection_id}/items?format=xml", headers=headers)
+
+        # then
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.parametrize("sort_string,expected_items", [
+        ("", all_items),
+        ("name=desc", [test_item_4, test_item_3, test_item_2, test_item_1]),
+        ("label=asc,name=asc", [test_item_3, test_item_4, test_item_1, test_item_2]),
+    ])
+    def test_get_collection_with_cursor(self, sort_string, expected_items):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+
+        collection_id = response.json()["id"]
+
+        for item in all_items:
+            requests.post(f"{url}/collections/{collection_id}/item", headers=headers, json=item)
+
+        # when
+        pages = []
+        cursor = ""
+        while cursor is not None:
+            response = requests.get(f"{url}/collections/{collection_id}/items?sort={sort_string}&limit=3&after={cursor}", headers=headers)
+            assert response.status_code == status.HTTP_200_OK
+
+            pages.append(response.json()["data"])
+            cursor = response.json()["next"]
+
+        # then
+        assert [len(page) for page in pages] == [3, 1]
+
+        items = [item for page in pages for item in page]
+        for item, expected_item in zip(items, expected_items):
+            assert item["name"] == expected_item["name"]
+
+    def test_get_collection_with_invalid_cursor(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        # when
+        response = requests.get(f"{url}/collections/{collection_id}/items?limit=3&after=invalid", headers=headers)
+
+        # then
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
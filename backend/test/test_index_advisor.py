@@ -0,0 +1,85 @@
+import requests
+from fastapi import status
+from pymongo import ASCENDING, DESCENDING
+
+from app.collections.index_advisor import build_index_shape, encode_shape, decode_shape, is_covered, is_valid_shape
+from .test_base import TestBase, url, test_item_1, test_item_2
+
+admin_headers = {"admin-key": "09g25e02fha9ca"}
+
+
+class TestIndexShape:
+
+    def test_build_index_shape_equality_sort_range(self):
+        shape = build_index_shape({"price": {"$gt": 2}, "label": "red"}, {"name": DESCENDING})
+
+        assert shape == (("label", ASCENDING), ("name", DESCENDING), ("price", ASCENDING))
+
+    def test_build_index_shape_ignores_id_and_keyset_conditions(self):
+        assert build_index_shape({"_id": "x", "$or": []}, {"_id": ASCENDING}) == ()
+        assert build_index_shape({"label": {"$in": ["red"]}}, {}) == (("label", ASCENDING),)
+
+    def test_encode_and_decode_shape(self):
+        shape = (("item.label", ASCENDING), ("timestamp", DESCENDING))
+
+        assert decode_shape(encode_shape(shape)) == shape
+
+    def test_only_sort_directions_are_valid_shapes(self):
+        assert is_valid_shape((("label", ASCENDING), ("price", DESCENDING)))
+        assert not is_valid_shape(build_index_shape({}, {"price": "foo"}))
+        assert not is_valid_shape(build_index_shape({}, {"price": 2.5}))
+        assert not is_valid_shape(build_index_shape({}, {"price": True}))
+
+    def test_is_covered_by_prefix_of_index(self):
+        index_keys = [(("_id", ASCENDING),), (("label", ASCENDING), ("price", DESCENDING))]
+
+        assert is_covered((("label", ASCENDING),), index_keys)
+        assert is_covered((("label", DESCENDING), ("price", ASCENDING)), index_keys)
+        assert not is_covered((("price", DESCENDING),), index_keys)
+
+
+class TestIndexAdvisorAPI(TestBase):
+
+    def test_get_recommendations(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        for item in [test_item_1, test_item_2]:
+            requests.post(f"{url}/collections/{collection_id}/item", headers=headers, json=item)
+
+        requests.get(f"{url}/collections/{collection_id}/items?filter=label=red&sort=name=asc", headers=headers)
+
+        # when
+        response = requests.get(
+            f"{url}/admin/indexes/recommendations?collection_id={collection_id}&threshold=1",
+            headers=headers | admin_headers
+        )
+
+        # then
+        assert response.status_code == status.HTTP_200_OK
+
+        recommendations = response.json()["data"]
+        assert recommendations == [{
+            "collection": collection_id,
+            "action": "create",
+            "name": "advisor_label_1_name_1",
+            "keys": [["label", 1], ["name", 1]],
+            "count": 1
+        }]
+
+    def test_get_recommendations_with_wrong_admin_key(self):
+        headers = {"Authorization": f"Bearer {self.access_token}", "admin-key": "wrong"}
+
+        response = requests.get(f"{url}/admin/indexes/recommendations", headers=headers)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_get_maintenance_reports(self):
+        headers = {"Authorization": f"Bearer {self.access_token}"} | admin_headers
+
+        response = requests.get(f"{url}/admin/maintenance/reports?limit=5", headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()["data"]) <= 5
@@ -0,0 +1,50 @@
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from fastapi import status
+
+from .test_base import TestBase, url, test_item_1
+
+requests_count = int(os.getenv("LATENCY_TEST_REQUESTS", "200"))
+concurrency = int(os.getenv("LATENCY_TEST_CONCURRENCY", "20"))
+p50_limit = float(os.getenv("LATENCY_TEST_P50_LIMIT", "0.25"))
+p99_limit = float(os.getenv("LATENCY_TEST_P99_LIMIT", "1.0"))
+# Grenzen hängen vom Rechner ab, deshalb nur auf Wunsch prüfen
+check_limits = os.getenv("LATENCY_TEST_CHECK_LIMITS", "0") == "1"
+
+
+class TestItemLatency(TestBase):
+    def test_create_item_latency_under_concurrency(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        session = requests.Session()
+        session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+        def create_item(index: int):
+            start = time.perf_counter()
+            response = session.post(f"{url}/collections/{collection_id}/item", headers=headers, json=test_item_1 | {"index": index})
+            return response.status_code, time.perf_counter() - start
+
+        # when
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(create_item, range(requests_count)))
+
+        # then
+        assert all(status_code == status.HTTP_200_OK for status_code, _ in results)
+
+        latencies = [latency for _, latency in results]
+        percentiles = statistics.quantiles(latencies, n=100)
+        p50, p99 = percentiles[49], percentiles[98]
+
+        if check_limits:
+            assert p50 <= p50_limit, f"p50={p50 * 1000:.1f} ms"
+            assert p99 <= p99_limit, f"p99={p99 * 1000:.1f} ms"
+
+        response = requests.get(f"{url}/collections/{collection_id}/sync", headers=headers)
+        assert response.json()["seq"] == requests_count
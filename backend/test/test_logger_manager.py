@@ -0,0 +1,79 @@
+import json
+import logging
+import queue
+
+from app.logger_manager import parse_log_levels, DroppingQueueHandler, BatchingQueueListener, LokiBatchHandler
+
+
+class CollectingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.flushes = 0
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+    def flush(self):
+        self.flushes += 1
+
+
+class TestLoggerManager:
+
+    def test_parse_log_levels(self):
+        levels = parse_log_levels("Redis Stream Manager=debug, Collections = WARNING,invalid")
+
+        assert levels == {"Redis Stream Manager": "DEBUG", "Collections": "WARNING"}
+
+    def test_full_queue_drops_records(self):
+        handler = DroppingQueueHandler(queue.Queue(2))
+        logger = logging.getLogger("test_full_queue_drops_records")
+        logger.addHandler(handler)
+        logger.propagate = False
+
+        for i in range(5):
+            logger.warning("message %s", i)
+
+        assert handler.dropped == 3
+
+    def test_listener_delivers_and_flushes_on_stop(self):
+        log_queue = queue.Queue(100)
+        handler = CollectingHandler()
+        listener = BatchingQueueListener(log_queue, handler)
+        listener.start()
+
+        logger = logging.getLogger("test_listener_delivers_and_flushes_on_stop")
+        logger.addHandler(DroppingQueueHandler(log_queue))
+        logger.propagate = False
+
+        for i in range(10):
+            logger.warning("message %s", i)
+
+        listener.stop()
+
+        assert handler.messages == [f"message {i}" for i in range(10)]
+        assert handler.flushes >= 1
+
+    def test_loki_handler_sends_batch_with_basic_auth(self, monkeypatch):
+        requests = []
+
+        class Response:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+        def urlopen(request, timeout):
+            requests.append(request)
+            return Response()
+
+        monkeypatch.setattr("urllib.request.urlopen", urlopen)
+        handler = LokiBatchHandler("http://loki/push", {"application": "test"}, auth=("user", "secret"), capacity=2)
+
+        for i in range(2):
+            handler.emit(logging.LogRecord("test", logging.INFO, __file__, 1, "message %s", (i,), None))
+
+        assert len(requests) == 1
+        assert requests[0].get_header("Authorization") == "Basic dXNlcjpzZWNyZXQ="
+        assert len(json.loads(requests[0].data)["streams"][0]["values"]) == 2
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta, timezone
+
+from app.collections.helper_methods import get_committed_seq, get_item_update, SEQ_PENDING_TIMEOUT
+
+
+class TestSequenceNumbers:
+
+    def test_committed_seq_without_pending_writes(self):
+        assert get_committed_seq({"seq": 7}) == 7
+        assert get_committed_seq({}) == 0
+
+    def test_pending_writes_hold_back_committed_seq(self):
+        now = datetime.now(timezone.utc)
+        collection_info = {"seq": 10, "pending_seq": [{"seq": 9, "at": now}, {"seq": 6, "at": now}]}
+
+        assert get_committed_seq(collection_info) == 5
+
+    def test_stale_pending_writes_are_ignored(self):
+        stale = datetime.now(timezone.utc) - timedelta(seconds=SEQ_PENDING_TIMEOUT + 1)
+        # MongoDB liefert Datumswerte ohne Zeitzone
+        collection_info = {"seq": 10, "pending_seq": [{"seq": 6, "at": stale.replace(tzinfo=None)}]}
+
+        assert get_committed_seq(collection_info) == 10
+
+    def test_item_update_never_lowers_seq(self):
+        update = get_item_update({"name": "test_item", "seq": 1, "_id": "x"}, 5)
+
+        assert update == {"$set": {"name": "test_item"}, "$max": {"seq": 5}}
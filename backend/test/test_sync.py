@@ -0,0 +1,62 @@
+import requests
+from fastapi import status
+
+from .test_base import TestBase, url, test_item_1, test_item_2, test_item_3
+
+
+class TestSyncAPI(TestBase):
+    def test_sync_collection_full(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        for item in [test_item_1, test_item_2]:
+            requests.post(f"{url}/collections/{collection_id}/item", headers=headers, json=item)
+
+        # when
+        response = requests.get(f"{url}/collections/{collection_id}/sync", headers=headers)
+
+        # then
+        assert response.status_code == status.HTTP_200_OK
+
+        json_response = response.json()
+        assert json_response["name"] == "test_collection"
+        assert json_response["seq"] == 2
+        assert len(json_response["data"]) == 2
+        assert json_response["removed"] == []
+
+    def test_sync_collection_delta(self):
+        # given
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = requests.post(f"{url}/collections/create/test_collection/test", headers=headers)
+        collection_id = response.json()["id"]
+
+        item_ids = []
+        for item in [test_item_1, test_item_2]:
+            response = requests.post(f"{url}/collections/{collection_id}/item", headers=headers, json=item)
+            item_ids.append(response.json()["id"])
+
+        response = requests.get(f"{url}/collections/{collection_id}/sync", headers=headers)
+        since = response.json()["seq"]
+
+        # when
+        requests.put(f"{url}/collections/{collection_id}/item/{item_ids[0]}", headers=headers, json={"name": "new name"})
+        requests.delete(f"{url}/collections/{collection_id}/item/{item_ids[1]}", headers=headers)
+        requests.post(f"{url}/collections/{collection_id}/item", headers=headers, json=test_item_3)
+
+        response = requests.get(f"{url}/collections/{collection_id}/sync?since={since}", headers=headers)
+
+        # then
+        assert response.status_code == status.HTTP_200_OK
+
+        json_response = response.json()
+        assert json_response["seq"] == since + 3
+
+        items = json_response["data"]
+        assert len(items) == 2
+        assert items[0]["id"] == item_ids[0]
+        assert items[0]["name"] == "new name"
+        assert items[1]["name"] == test_item_3["name"]
+
+        assert json_response["removed"] == [item_ids[1]]
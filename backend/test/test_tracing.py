@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from prometheus_client import REGISTRY
+
+from app.tracing import get_trace_fields, get_produced_at
+from app.redis_stream_manager import RedisStreamManager
+from app.websocket_connection import WebsocketConnection
+
+
+class FakeWebsocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, message):
+        self.sent.append(message)
+
+
+def get_delivery_count(stage: str) -> float:
+    return REGISTRY.get_sample_value("item_delivery_latency_seconds_count", {"stage": stage}) or 0.0
+
+
+class TestTracing:
+
+    def test_trace_fields(self):
+        before = time.time()
+        fields = get_trace_fields()
+
+        assert len(fields["trace_id"]) == 32
+        assert before <= get_produced_at(fields) <= time.time()
+
+        fields = get_trace_fields(trace_id="abc", produced_at=12.5)
+        assert fields["trace_id"] == "abc"
+        assert get_produced_at(fields) == 12.5
+
+    def test_produced_at_of_old_messages(self):
+        assert get_produced_at({"channel": "c", "sender": "u", "data": "{}"}) is None
+        assert get_produced_at({"produced_at": "invalid"}) is None
+
+    def test_send_data_keeps_trace_fields(self):
+        stream_manager = RedisStreamManager(None)
+        trace_fields = get_trace_fields(trace_id="abc", produced_at=12.5)
+
+        send_data = stream_manager.get_send_data("collection", "user", "{}", trace_fields)
+
+        assert send_data == {"channel": "collection", "sender": "user", "data": "{}", "trace_id": "abc", "produced_at": "12.5"}
+        assert "trace_id" in stream_manager.get_send_data("collection", "user", "{}")
+
+    def test_websocket_delivery_latency(self):
+        async def deliver():
+            websocket = FakeWebsocket()
+            connection = WebsocketConnection(websocket, "user", "collection")
+
+            connection.send("with trace", get_trace_fields(produced_at=time.time() - 0.2))
+            connection.send("without trace")
+            await asyncio.sleep(0.05)
+            connection.stop()
+
+            return websocket.sent
+
+        count = get_delivery_count("websocket")
+        sum_before = REGISTRY.get_sample_value("item_delivery_latency_seconds_sum", {"stage": "websocket"}) or 0.0
+
+        assert asyncio.run(deliver()) == ["with trace", "without trace"]
+        assert get_delivery_count("websocket") == count + 1
+        assert REGISTRY.get_sample_value("item_delivery_latency_seconds_sum", {"stage": "websocket"}) - sum_before >= 0.2